@@ -1,4 +1,4 @@
-from openai import OpenAI
+from openai import OpenAI, RateLimitError, APITimeoutError, APIConnectionError, InternalServerError
 import os
 from dotenv import load_dotenv
 from colorama import Fore, Style, init
@@ -7,7 +7,12 @@ from datetime import datetime, timedelta
 import json
 import time
 import io
+import random
 import traceback
+import concurrent.futures
+from disk_cache import DiskCache
+from prompt_budget import (count_tokens, build_news_section, build_cio_reports,
+                           CATALYST_NEWS_TOKENS, CONTEXT_NEWS_TOKENS, CIO_REPORTS_TOKENS)
 
 init(autoreset=True)
 
@@ -17,7 +22,76 @@ api_key = os.getenv("OPENAI_API_KEY")
 if not api_key:
     raise ValueError("❌ ERROR: No se encontró la API Key en el archivo .env")
 
-client = OpenAI(api_key=api_key)
+# Retries are handled by _create_completion (rate-limit aware backoff)
+client = OpenAI(api_key=api_key, max_retries=0)
+
+# Límite de análisis individuales simultáneos y reintentos ante rate limits
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_MAX = 30.0
+
+# Tokens para todos los veredictos que recibe el CIO (se reparten entre los activos)
+CIO_PROMPT_TOKENS = int(os.getenv("CIO_PROMPT_TOKENS", str(CIO_REPORTS_TOKENS)))
+
+# Caché de respuestas: mismo prompt + mismo modelo = misma respuesta durante la jornada
+llm_cache = DiskCache(
+    "llm_responses",
+    ttl=int(os.getenv("LLM_CACHE_TTL", str(12 * 3600))),
+    max_bytes=int(os.getenv("LLM_CACHE_MAX_MB", "50")) * 1024 * 1024
+)
+
+def _retry_delay(error, attempt):
+    """Seconds to wait before retry `attempt`: the API's Retry-After if sent, else exponential backoff with jitter"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), LLM_BACKOFF_MAX)
+    except ValueError:
+        pass
+    return min(LLM_BACKOFF_MAX, 2 ** attempt) + random.uniform(0, 1)
+
+def _create_completion(**kwargs):
+    """
+    client.chat.completions.create with retries on rate limits and transient API errors.
+    An exhausted quota ('insufficient_quota') is not retried.
+    """
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            return client.chat.completions.create(**kwargs)
+        except (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError) as e:
+            if attempt == LLM_MAX_RETRIES or getattr(e, "code", None) == "insufficient_quota":
+                raise
+            delay = _retry_delay(e, attempt)
+            print(Fore.YELLOW + f"   [LLM] ⏳ {type(e).__name__}: reintento {attempt + 1}/{LLM_MAX_RETRIES} en {delay:.1f}s...")
+            time.sleep(delay)
+
+def _stream_completion(on_token, **kwargs):
+    """
+    Streaming variant of _create_completion: calls on_token(text) for each content delta
+    as it arrives. Returns (content, usage, time_to_first_token, total_latency), times in
+    seconds from the request. Only opening the stream is retried.
+    """
+    start = time.time()
+    stream = _create_completion(stream=True, stream_options={"include_usage": True}, **kwargs)
+    parts, usage, first_token = [], None, None
+    for chunk in stream:
+        if getattr(chunk, "usage", None):
+            usage = chunk.usage  # Last chunk, without choices
+        if not chunk.choices:
+            continue
+        text = chunk.choices[0].delta.content
+        if text:
+            if first_token is None:
+                first_token = time.time() - start
+            parts.append(text)
+            on_token(text)
+    return "".join(parts), usage, first_token, time.time() - start
+
+def _token_usage(usage):
+    if usage is None:
+        return {"total_tokens": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    return {"total_tokens": usage.total_tokens, "prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
 
 def _validate_model_name(model_name):
     """
@@ -31,16 +105,20 @@ def _validate_model_name(model_name):
     }
     return model_map.get(model_name, "gpt-5.1")
 
-def analyze_stock(ticker, data, model="gpt-5.1", reasoning_effort="none"):
+def analyze_stock(ticker, data, model="gpt-5.1", reasoning_effort="none", on_token=None):
     """
     Legacy wrapper for single stock analysis. Now redirects to the deep analysis function.
     """
-    return analyze_individual_stock_deeply(ticker, data, model, reasoning_effort)
+    return analyze_individual_stock_deeply(ticker, data, model, reasoning_effort, on_token)
 
-def analyze_individual_stock_deeply(ticker, data, model="gpt-5.1", reasoning_effort="none"):
+def analyze_individual_stock_deeply(ticker, data, model="gpt-5.1", reasoning_effort="none", on_token=None):
     """
     Realiza un análisis profundo e INDIVIDUAL de un activo.
     NO ASUME TENDENCIAS. Analiza indicadores técnicos fríamente y noticias de largo/corto plazo.
+    
+    With `on_token` the response is streamed: on_token(text) receives each fragment as it
+    arrives (a cached answer arrives as one fragment) and metrics gain
+    time_to_first_token / total_latency.
     """
     start_time = time.time()
     valid_model = _validate_model_name(model)
@@ -78,22 +156,13 @@ def analyze_individual_stock_deeply(ticker, data, model="gpt-5.1", reasoning_eff
                 # If date parsing fails, put in context to be safe unless it looks very recent
                 context_news.append(n)
     
-    # Format for Prompt
-    catalyst_text = ""
-    if catalyst_news:
-        catalyst_text = "--- ⚡ CATALIZADORES (Últimos 5 días - ACCIÓN INMEDIATA) ---\n"
-        for n in catalyst_news:
-            catalyst_text += f"- [{n.get('published')}] {n.get('title')} ({n.get('source')})\n"
-    else:
-        catalyst_text = "No hay noticias de alto impacto en los últimos 5 días.\n"
-        
-    context_text = ""
-    if context_news:
-        context_text = "--- 🏗️ CONTEXTO (Últimos 90 días - SUELO FUNDAMENTAL / EARNINGS) ---\n"
-        for n in context_news[:15]: # Limit context to top 15 relevant
-            context_text += f"- [{n.get('published')}] {n.get('title')} ({n.get('source')})\n"
-    else:
-        context_text = "No hay noticias de contexto relevante.\n"
+    # Format for Prompt (ranked by recency/relevance, each section within its token budget)
+    catalyst_text = build_news_section(
+        catalyst_news, ticker, "--- ⚡ CATALIZADORES (Últimos 5 días - ACCIÓN INMEDIATA) ---",
+        "No hay noticias de alto impacto en los últimos 5 días.\n", CATALYST_NEWS_TOKENS)
+    context_text = build_news_section(
+        context_news, ticker, "--- 🏗️ CONTEXTO (Últimos 90 días - SUELO FUNDAMENTAL / EARNINGS) ---",
+        "No hay noticias de contexto relevante.\n", CONTEXT_NEWS_TOKENS, max_items=15)
 
     system_prompt = f"""
     Eres un Analista Técnico y Fundamental Senior. Tu trabajo es analizar el activo {ticker} de forma INDIVIDUAL y OBJETIVA.
@@ -162,21 +231,44 @@ def analyze_individual_stock_deeply(ticker, data, model="gpt-5.1", reasoning_eff
         # GPT-5.1 supports reasoning_effort
         if valid_model == "gpt-5.1":
             kwargs["reasoning_effort"] = reasoning_effort
-
-        response = client.chat.completions.create(**kwargs)
         
-        analysis = response.choices[0].message.content
+        # Content-addressed cache: the key covers the rendered prompts and model parameters
+        cache_key = DiskCache.make_key(kwargs)
+        cached = llm_cache.get(cache_key)
+        if cached:
+            print(Fore.GREEN + f"   [LLM] ♻️ {ticker}: respuesta en caché (0 tokens).")
+            if on_token:
+                on_token(cached["analysis"])
+            metrics = {
+                "execution_time": time.time() - start_time,
+                "token_usage": {"total_tokens": 0, "prompt_tokens": 0, "completion_tokens": 0},
+                "cache_hit": True,
+                "cached_token_usage": cached["token_usage"]
+            }
+            if on_token:
+                metrics["time_to_first_token"] = metrics["total_latency"] = 0.0
+            return cached["analysis"], metrics
+
+        if on_token:
+            analysis, usage, first_token, latency = _stream_completion(on_token, **kwargs)
+            print(Fore.GREEN + f"   [LLM] ⚡ {ticker}: primer token en {first_token or latency:.2f}s, completo en {latency:.2f}s.")
+        else:
+            response = _create_completion(**kwargs)
+            analysis, usage = response.choices[0].message.content, response.usage
         
         # Metrics
         end_time = time.time()
         metrics = {
             "execution_time": end_time - start_time,
-            "token_usage": {
-                "total_tokens": response.usage.total_tokens,
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens
-            }
+            "token_usage": _token_usage(usage),
+            "cache_hit": False
         }
+        if on_token:
+            metrics["time_to_first_token"] = first_token
+            metrics["total_latency"] = latency
+        
+        if analysis:
+            llm_cache.set(cache_key, {"analysis": analysis, "token_usage": metrics["token_usage"]})
         
         return analysis, metrics
 
@@ -184,9 +276,12 @@ def analyze_individual_stock_deeply(ticker, data, model="gpt-5.1", reasoning_eff
         traceback.print_exc()
         return f"❌ Error analizando {ticker}: {str(e)}", None
 
-def recommend_capital_distribution(capital_amount, tickers_data, model="gpt-5.1", reasoning_effort="none", progress_callback=None):
+def recommend_capital_distribution(capital_amount, tickers_data, model="gpt-5.1", reasoning_effort="none", progress_callback=None, max_concurrency=None, on_token=None):
     """
     Genera una recomendación de distribución de capital basada en análisis individuales profundos.
+    Los análisis individuales corren en paralelo (hasta max_concurrency, por defecto
+    LLM_MAX_CONCURRENCY) y se conservan en el orden de tickers_data.
+    Con `on_token` el veredicto final se transmite en streaming (ver analyze_individual_stock_deeply).
     """
     start_time = time.time()
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -196,42 +291,64 @@ def recommend_capital_distribution(capital_amount, tickers_data, model="gpt-5.1"
     print(Fore.CYAN + f"\n{msg}")
     if progress_callback: progress_callback(msg)
     
-    # --- FASE 1: ANÁLISIS INDIVIDUAL (Iterativo) ---
-    individual_reports = []
+    # --- FASE 1: ANÁLISIS INDIVIDUAL (Concurrente) ---
+    tickers = list(tickers_data.keys())
+    individual_reports = [None] * len(tickers)
+    raw_reports = [None] * len(tickers)
     total_tokens = 0
+    cache_hits = 0
     
     # Prompt acumulativo para el debug
-    debug_prompts = []
+    debug_prompts = [None] * len(tickers)
     
-    for ticker, data in tickers_data.items():
-        msg = f"   [Agent] Analizando {ticker} individualmente..."
-        print(Fore.YELLOW + msg)
-        if progress_callback: progress_callback(f"🕵️ Analizando {ticker}...")
-        
-        report, metrics = analyze_individual_stock_deeply(ticker, data, model, reasoning_effort)
-        
-        if metrics:
-            total_tokens += metrics['token_usage']['total_tokens']
+    max_workers = max(1, min(max_concurrency or LLM_MAX_CONCURRENCY, len(tickers)))
+    msg = f"   [Agent] Analizando {len(tickers)} activos individualmente ({max_workers} en paralelo)..."
+    print(Fore.YELLOW + msg)
+    if progress_callback: progress_callback(f"🕵️ Analizando {', '.join(tickers)}...")
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_index = {
+            executor.submit(analyze_individual_stock_deeply, ticker, tickers_data[ticker], model, reasoning_effort): i
+            for i, ticker in enumerate(tickers)
+        }
+        # progress_callback runs here, on the caller's thread (Streamlit widgets are not thread-safe)
+        for future in concurrent.futures.as_completed(future_to_index):
+            i = future_to_index[future]
+            ticker = tickers[i]
+            try:
+                report, metrics = future.result()
+            except Exception as e:
+                report, metrics = f"❌ Error analizando {ticker}: {str(e)}", None
             
-        individual_reports.append(f"---\n{report}\n---")
-        debug_prompts.append(f"ANÁLISIS {ticker}:\n{report}")
+            if metrics:
+                total_tokens += metrics['token_usage']['total_tokens']
+                cache_hits += 1 if metrics.get('cache_hit') else 0
+            
+            raw_reports[i] = report
+            individual_reports[i] = f"---\n{report}\n---"
+            debug_prompts[i] = f"ANÁLISIS {ticker}:\n{report}"
+            if progress_callback: progress_callback(f"✅ {ticker} analizado.")
 
     # --- FASE 2: EL JEFE (Asignación de Capital) ---
     msg = "   [Agent] Generando decisión final de asignación (El Jefe)..."
     print(Fore.CYAN + msg)
     if progress_callback: progress_callback("🧠 El Jefe está decidiendo la asignación de capital...")
     
-    all_reports_text = "\n".join(individual_reports)
+    # El CIO recibe veredictos estructurados (no los reportes completos): el prompt no crece sin límite con la cartera
+    all_reports_text = build_cio_reports(
+        [(ticker, raw_reports[i], tickers_data[ticker].get('daily') or tickers_data[ticker]) for i, ticker in enumerate(tickers)],
+        CIO_PROMPT_TOKENS)
+    print(Fore.YELLOW + f"   [Agent] Veredictos para el CIO: ~{count_tokens(all_reports_text)} tokens ({len(tickers)} activos)")
     
     boss_system_prompt = f"""
-    Eres el CIO (Chief Investment Officer). Has recibido los reportes detallados de tus analistas sobre {len(tickers_data)} activos.
+    Eres el CIO (Chief Investment Officer). Has recibido los veredictos de tus analistas sobre {len(tickers_data)} activos.
     
     Tu trabajo NO es re-analizar técnicamente (eso ya lo hicieron tus analistas), sino TOMAR DECISIONES DE DINERO.
     
     Tienes un capital de: ${capital_amount}.
     
     ### TUS INSTRUCCIONES:
-    1.  Lee los reportes individuales adjuntos.
+    1.  Lee los veredictos individuales adjuntos (acción, timing y motivo de cada analista).
     2.  Identifica las MEJORES oportunidades (donde el analista dijo "COMPRAR").
     3.  Identifica dónde hay que ESPERAR (donde el analista dijo "Espera X días").
     4.  Asigna el capital de forma inteligente. NO pongas todo en una sola, pero tampoco diluyas demasiado.
@@ -264,7 +381,7 @@ def recommend_capital_distribution(capital_amount, tickers_data, model="gpt-5.1"
     """
     
     boss_user_prompt = f"""
-    Aquí están los reportes de tus analistas:
+    Aquí están los veredictos de tus analistas:
     
     {all_reports_text}
     
@@ -284,22 +401,30 @@ def recommend_capital_distribution(capital_amount, tickers_data, model="gpt-5.1"
         if valid_model == "gpt-5.1":
             kwargs["reasoning_effort"] = reasoning_effort
 
-        response = client.chat.completions.create(**kwargs)
-        
-        final_verdict = response.choices[0].message.content
+        # El veredicto del Jefe se puede ir mostrando mientras se genera (on_token)
+        if on_token:
+            final_verdict, usage, first_token, latency = _stream_completion(on_token, **kwargs)
+        else:
+            response = _create_completion(**kwargs)
+            final_verdict, usage = response.choices[0].message.content, response.usage
+        boss_usage = _token_usage(usage)
         
         # Metrics Finales
         end_time = time.time()
-        total_tokens += response.usage.total_tokens
+        total_tokens += boss_usage["total_tokens"]
         
         metrics = {
             "execution_time": end_time - start_time,
             "token_usage": {
                 "total_tokens": total_tokens,
-                "prompt_tokens": response.usage.prompt_tokens, # Solo del último call
-                "completion_tokens": response.usage.completion_tokens # Solo del último call
-            }
+                "prompt_tokens": boss_usage["prompt_tokens"], # Solo del último call
+                "completion_tokens": boss_usage["completion_tokens"] # Solo del último call
+            },
+            "cache_hits": cache_hits  # Análisis individuales servidos desde la caché
         }
+        if on_token:
+            metrics["time_to_first_token"] = first_token  # Del veredicto final
+            metrics["total_latency"] = latency
         
         # --- Generación de Excel para Debugging (IN MEMORY) ---
         filename = f"analysis_debug_{timestamp}.xlsx"
@@ -1,11 +1,16 @@
 import streamlit as st
 import pandas as pd
-from data_loader import get_market_data, get_multi_timeframe_data
+from data_loader import get_market_data, get_multi_timeframe_data, iter_market_data, get_bulk_histories, get_chart_history, BARS_PER_YEAR
 from agent_logic import analyze_stock, recommend_capital_distribution
+from calculate_indicators import add_signal_columns
+from chart_data import prepare_chart_data, history_version
 from colorama import Fore, Style, init
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import threading
+import time
 import warnings
 
 # Suppress specific Streamlit RuntimeWarning
@@ -169,10 +174,14 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def create_dashboard(df, ticker):
+def create_dashboard(df, ticker, window_bars=252):
     """Crea un gráfico interactivo profesional con Plotly"""
-    # Create copy to avoid mutating original data
-    df = df.copy()
+    # Las señales vienen calculadas del pipeline de datos; solo se leen (sin copiar el frame)
+    if 'Buy_Signal' not in df.columns:
+        df = add_signal_columns(df.copy())
+    # Ventana visible a resolución completa + resumen reducido del resto (ver prepare_chart_data)
+    chart = prepare_chart_data(df, window_bars=window_bars)
+    candles, lines = chart['candles'], chart['lines']
     
     # Aumentamos filas para nuevos indicadores
     fig = make_subplots(rows=4, cols=1, shared_xaxes=True, 
@@ -182,66 +191,48 @@ def create_dashboard(df, ticker):
 
     # --- PANEL 1: Candlestick y Bollinger ---
     # Velas
-    fig.add_trace(go.Candlestick(x=df.index,
-                                 open=df['Open'], high=df['High'],
-                                 low=df['Low'], close=df['Close'],
+    fig.add_trace(go.Candlestick(x=candles.index,
+                                 open=candles['Open'], high=candles['High'],
+                                 low=candles['Low'], close=candles['Close'],
                                  name='Precio'), row=1, col=1)
     
     # Bandas de Bollinger
-    fig.add_trace(go.Scatter(x=df.index, y=df['BB_Upper'], line=dict(color='rgba(0, 255, 255, 0.3)', width=1), name='BB Upper'), row=1, col=1)
-    fig.add_trace(go.Scatter(x=df.index, y=df['BB_Lower'], line=dict(color='rgba(0, 255, 255, 0.3)', width=1), name='BB Lower', fill='tonexty', fillcolor='rgba(0, 255, 255, 0.05)'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=lines['BB_Upper'].index, y=lines['BB_Upper'], line=dict(color='rgba(0, 255, 255, 0.3)', width=1), name='BB Upper'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=lines['BB_Lower'].index, y=lines['BB_Lower'], line=dict(color='rgba(0, 255, 255, 0.3)', width=1), name='BB Lower', fill='tonexty', fillcolor='rgba(0, 255, 255, 0.05)'), row=1, col=1)
     
     # EMAs
-    fig.add_trace(go.Scatter(x=df.index, y=df['EMA_50'], line=dict(color='#ffaa00', width=1.5), name='EMA 50 (Medio Plazo)'), row=1, col=1)
-    fig.add_trace(go.Scatter(x=df.index, y=df['EMA_200'], line=dict(color='#ff3333', width=2.5), name='EMA 200 (Tendencia Mayor)'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=lines['EMA_50'].index, y=lines['EMA_50'], line=dict(color='#ffaa00', width=1.5), name='EMA 50 (Medio Plazo)'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=lines['EMA_200'].index, y=lines['EMA_200'], line=dict(color='#ff3333', width=2.5), name='EMA 200 (Tendencia Mayor)'), row=1, col=1)
 
-    # --- ESTRATEGIA "GOLDEN TREND MOMENTUM" ---
+    # --- ESTRATEGIA "GOLDEN TREND MOMENTUM" (ver add_signal_columns) ---
     # 1. Tendencia: Precio > EMA 200 (Alcista) / Precio < EMA 200 (Bajista)
     # 2. Momentum: Cruce de MACD
     # 3. Filtro: RSI no extremo
-    
-    # Detectar cruces de MACD
-    df['MACD_Cross_Up'] = (df['MACD'] > df['MACD_Signal']) & (df['MACD'].shift(1) <= df['MACD_Signal'].shift(1))
-    df['MACD_Cross_Down'] = (df['MACD'] < df['MACD_Signal']) & (df['MACD'].shift(1) >= df['MACD_Signal'].shift(1))
-    
-    # Señales de Compra (Trend Following)
-    buy_signals = df[
-        (df['Close'] > df['EMA_200']) &      # Tendencia Alcista
-        (df['MACD_Cross_Up']) &              # Momentum Positivo
-        (df['RSI'] < 70)                     # No sobrecomprado
-    ]
-    
-    # Señales de Venta (Trend Following)
-    sell_signals = df[
-        (df['Close'] < df['EMA_200']) &      # Tendencia Bajista
-        (df['MACD_Cross_Down']) &            # Momentum Negativo
-        (df['RSI'] > 30)                     # No sobrevendido
-    ]
-
-    fig.add_trace(go.Scatter(x=buy_signals.index, y=buy_signals['Close']*0.98, mode='markers', 
+    buy_signals, sell_signals = chart['buy'], chart['sell']
+
+    fig.add_trace(go.Scatter(x=buy_signals.index, y=buy_signals*0.98, mode='markers', 
                              marker=dict(symbol='triangle-up', size=16, color='#00ff00', line=dict(width=2, color='black')), name='🟢 BUY SIGNAL'), row=1, col=1)
-    fig.add_trace(go.Scatter(x=sell_signals.index, y=sell_signals['Close']*1.02, mode='markers', 
+    fig.add_trace(go.Scatter(x=sell_signals.index, y=sell_signals*1.02, mode='markers', 
                              marker=dict(symbol='triangle-down', size=16, color='#ff0000', line=dict(width=2, color='black')), name='🔴 SELL SIGNAL'), row=1, col=1)
 
     # --- PANEL 2: RSI ---
-    fig.add_trace(go.Scatter(x=df.index, y=df['RSI'], line=dict(color='#d2a8ff', width=2), name='RSI'), row=2, col=1)
+    fig.add_trace(go.Scatter(x=lines['RSI'].index, y=lines['RSI'], line=dict(color='#d2a8ff', width=2), name='RSI'), row=2, col=1)
     fig.add_hline(y=70, line_dash="dot", line_color="#ff5555", row=2, col=1, annotation_text="Sobrecompra", annotation_position="top left")
     fig.add_hline(y=30, line_dash="dot", line_color="#55ff55", row=2, col=1, annotation_text="Sobreventa", annotation_position="bottom left")
-    fig.add_shape(type="rect", x0=df.index[0], x1=df.index[-1], y0=30, y1=70, fillcolor="rgba(128, 128, 128, 0.1)", layer="below", line_width=0, row=2, col=1)
+    fig.add_shape(type="rect", x0=chart['start'], x1=chart['end'], y0=30, y1=70, fillcolor="rgba(128, 128, 128, 0.1)", layer="below", line_width=0, row=2, col=1)
 
     # --- PANEL 3: Stochastic ---
-    fig.add_trace(go.Scatter(x=df.index, y=df['Stoch_K'], line=dict(color='#58a6ff', width=1.5), name='Stoch %K'), row=3, col=1)
-    fig.add_trace(go.Scatter(x=df.index, y=df['Stoch_D'], line=dict(color='#ffa657', width=1.5, dash='dot'), name='Stoch %D'), row=3, col=1)
+    fig.add_trace(go.Scatter(x=lines['Stoch_K'].index, y=lines['Stoch_K'], line=dict(color='#58a6ff', width=1.5), name='Stoch %K'), row=3, col=1)
+    fig.add_trace(go.Scatter(x=lines['Stoch_D'].index, y=lines['Stoch_D'], line=dict(color='#ffa657', width=1.5, dash='dot'), name='Stoch %D'), row=3, col=1)
     fig.add_hline(y=80, line_dash="dot", line_color="#ff5555", row=3, col=1)
     fig.add_hline(y=20, line_dash="dot", line_color="#55ff55", row=3, col=1)
-    fig.add_shape(type="rect", x0=df.index[0], x1=df.index[-1], y0=20, y1=80, fillcolor="rgba(128, 128, 128, 0.1)", layer="below", line_width=0, row=3, col=1)
+    fig.add_shape(type="rect", x0=chart['start'], x1=chart['end'], y0=20, y1=80, fillcolor="rgba(128, 128, 128, 0.1)", layer="below", line_width=0, row=3, col=1)
 
     # --- PANEL 4: MACD & ADX ---
-    # Usamos colores condicionales para el histograma
-    colors = ['#238636' if v >= 0 else '#da3633' for v in df['MACD_Hist']]
-    fig.add_trace(go.Bar(x=df.index, y=df['MACD_Hist'], marker_color=colors, name='MACD Hist'), row=4, col=1)
-    fig.add_trace(go.Scatter(x=df.index, y=df['MACD'], line=dict(color='#58a6ff', width=1.5), name='MACD Line'), row=4, col=1)
-    fig.add_trace(go.Scatter(x=df.index, y=df['MACD_Signal'], line=dict(color='#ffa657', width=1.5), name='Signal Line'), row=4, col=1)
+    # Colores condicionales del histograma (vectorizados en prepare_chart_data)
+    fig.add_trace(go.Bar(x=lines['MACD_Hist'].index, y=lines['MACD_Hist'], marker_color=chart['macd_colors'], name='MACD Hist'), row=4, col=1)
+    fig.add_trace(go.Scatter(x=lines['MACD'].index, y=lines['MACD'], line=dict(color='#58a6ff', width=1.5), name='MACD Line'), row=4, col=1)
+    fig.add_trace(go.Scatter(x=lines['MACD_Signal'].index, y=lines['MACD_Signal'], line=dict(color='#ffa657', width=1.5), name='Signal Line'), row=4, col=1)
     
     # Layout Profesional
     fig.update_layout(
@@ -262,10 +253,60 @@ def create_dashboard(df, ticker):
     
     return fig
 
-@st.cache_data(ttl=300, show_spinner=False)  # Cache for 5 minutes
-def get_cached_market_data(ticker):
-    """Cached wrapper around get_multi_timeframe_data"""
-    return get_multi_timeframe_data(ticker)
+@st.cache_resource(ttl=3600, max_entries=64, show_spinner=False)
+def get_cached_dashboard(ticker, interval, version, window_bars, _df):
+    """
+    Built figure per (ticker, interval, data version, detail window): reruns without new
+    data skip create_dashboard. `_df` is not hashed; `version` (history_version) stands
+    in for it. cache_resource hands back the same object (read-only for st.plotly_chart).
+    """
+    return create_dashboard(_df, ticker, window_bars=window_bars)
+
+MARKET_DATA_TTL = 300  # 5 minutes
+_market_data_cached_at = {}  # ticker -> when get_cached_market_data last filled its entry
+
+@st.cache_data(ttl=MARKET_DATA_TTL, show_spinner=False)
+def get_cached_market_data(ticker, _daily_hist=None):
+    """Cached wrapper around get_multi_timeframe_data (keyed by ticker only, compact histories)"""
+    bundle = get_multi_timeframe_data(ticker, daily_hist=_daily_hist, compact=True)
+    _market_data_cached_at[ticker] = time.time()
+    return bundle
+
+def tickers_without_cached_data(tickers):
+    """Tickers get_cached_market_data would have to fetch (no live cache entry)"""
+    now = time.time()
+    return [t for t in dict.fromkeys(tickers) if now - _market_data_cached_at.get(t, 0) >= MARKET_DATA_TTL]
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_cached_chart_history(ticker, interval="1d"):
+    """Cached wrapper around get_chart_history (longer history, only for the chart)"""
+    return get_chart_history(ticker, interval, compact=True)
+
+def stream_renderer(placeholder, min_interval=0.1):
+    """on_token callback that redraws `placeholder` with the text so far, at most every min_interval s"""
+    parts = []
+    last_render = [0.0]
+    def on_token(text):
+        parts.append(text)
+        now = time.monotonic()
+        if now - last_render[0] >= min_interval:
+            placeholder.markdown("".join(parts) + " ▌")
+            last_render[0] = now
+    return on_token
+
+def latency_note(metrics):
+    """Caption fragment with the streaming time-to-first-token, if measured"""
+    if metrics.get('time_to_first_token') is None:
+        return ""
+    return f" | ⚡ Primer token: {metrics['time_to_first_token']:.2f}s (total {metrics['total_latency']:.2f}s)"
+
+def with_script_run_ctx(fn):
+    """Lets worker threads use st.cache_data under the current session's script context"""
+    ctx = get_script_run_ctx()
+    def wrapper(*args, **kwargs):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args, **kwargs)
+    return wrapper
 
 def main():
     # Header Principal
@@ -285,6 +326,9 @@ def main():
         
         # Selector de Timeframe
         chart_interval = st.selectbox("Chart Timeframe", ["1d", "1wk", "1mo"], index=0)
+        # Últimas barras a resolución completa; el resto del gráfico va reducido
+        chart_detail = st.select_slider("Chart Detail Window", options=["6M", "1Y", "2Y", "All"], value="1Y",
+                                        help="Most recent period drawn bar by bar. Older history is downsampled.")
 
         st.markdown("---")
         st.markdown("### 🧠 Intelligence Core")
@@ -348,6 +392,14 @@ def main():
                 # Extract data for UI
                 llm_data = data_bundle # Pass the whole bundle to LLM
                 hist_data = data_bundle['daily_hist'] if chart_interval == '1d' else data_bundle['weekly_hist']
+                if chart_interval == '1d':
+                    # The bundle only holds the analysis lookback; the chart shows a longer window
+                    try:
+                        chart_hist = get_cached_chart_history(ticker)
+                        if chart_hist is not None and not chart_hist.empty:
+                            hist_data = chart_hist
+                    except Exception as e:
+                        print(Fore.YELLOW + f"   [Debug] Chart history unavailable, using analysis window: {e}")
                 raw_news = data_bundle['news']
                 
                 # Display key metrics from Daily data
@@ -364,8 +416,11 @@ def main():
                 
                 status.write(f"🧠 **Phase 2: Engaging Neural Engine ({model_info})...**")
                 
-                # 2. Ejecutar Agente con modelo seleccionado
-                analysis, metrics = analyze_stock(ticker, llm_data, model=selected_model, reasoning_effort=reasoning_effort)
+                # 2. Ejecutar Agente con modelo seleccionado (el informe se va mostrando mientras se genera)
+                live_report = status.empty()
+                analysis, metrics = analyze_stock(ticker, llm_data, model=selected_model, reasoning_effort=reasoning_effort,
+                                                  on_token=stream_renderer(live_report))
+                live_report.empty()
 
                 status.write("✅ Intelligence Report Generated.")
                 status.update(label="✨ Analysis Complete", state="complete", expanded=False)
@@ -415,7 +470,10 @@ def main():
         tab1, tab2, tab3 = st.tabs(["📈 TECHNICAL CHART", "🧠 AI ANALYSIS", "📰 LIVE NEWS"])
 
         with tab1:
-            st.plotly_chart(create_dashboard(hist_data, ticker), use_container_width=True)
+            bars_per_year = BARS_PER_YEAR['1d'] if chart_interval == '1d' else BARS_PER_YEAR['1wk']  # 1wk/1mo use weekly bars
+            window_bars = {"6M": bars_per_year // 2, "1Y": bars_per_year, "2Y": 2 * bars_per_year}.get(chart_detail, len(hist_data))
+            fig = get_cached_dashboard(ticker, chart_interval, history_version(hist_data), window_bars, hist_data)
+            st.plotly_chart(fig, use_container_width=True)
 
         with tab2:
             st.markdown(f"""
@@ -428,7 +486,8 @@ def main():
             """, unsafe_allow_html=True)
             
             if metrics:
-                st.caption(f"⏱️ Tiempo: {metrics['execution_time']:.2f}s | 🪙 Tokens: {metrics['token_usage']['total_tokens']} (Prompt: {metrics['token_usage']['prompt_tokens']}, Compl: {metrics['token_usage']['completion_tokens']})")
+                cache_note = " | ♻️ Respuesta en caché" if metrics.get('cache_hit') else ""
+                st.caption(f"⏱️ Tiempo: {metrics['execution_time']:.2f}s | 🪙 Tokens: {metrics['token_usage']['total_tokens']} (Prompt: {metrics['token_usage']['prompt_tokens']}, Compl: {metrics['token_usage']['completion_tokens']}){cache_note}{latency_note(metrics)}")
             
         with tab3:
             st.subheader("Últimas Noticias")
@@ -461,24 +520,32 @@ def main():
                     tickers_data = {}
                     failed_tickers = []
                     
-                    for ticker_symbol in selected_tickers:
-                        status.update(label=f"⏳ Scanning {ticker_symbol}...", state="running")
-                        print(Fore.YELLOW + f"   [Debug] Processing {ticker_symbol}...")
-                        status.write(f"🔄 Processing {ticker_symbol}...")
+                    # Historiales en descarga agrupada, solo de los tickers sin datos en caché
+                    # (get_bulk_histories pasa por el almacén OHLCV: de los ya guardados solo baja la cola)
+                    to_download = tickers_without_cached_data(selected_tickers)
+                    daily_histories = {}
+                    if to_download:
+                        status.update(label=f"⏳ Downloading {len(to_download)} histories...", state="running")
                         try:
-                            # Use get_cached_market_data which now returns multi-timeframe bundle
-                            data_bundle, error = get_cached_market_data(ticker_symbol)
-                            
-                            if error:
-                                status.write(f"⚠️ Data Error {ticker_symbol}: {error}")
-                                failed_tickers.append(ticker_symbol)
-                            else:
-                                tickers_data[ticker_symbol] = data_bundle
-                                status.write(f"✅ {ticker_symbol}: ${data_bundle['daily'].get('price')} | Trend: {data_bundle['daily'].get('trend')}")
+                            daily_histories = get_bulk_histories(to_download)
                         except Exception as e:
-                            print(Fore.RED + f"   [Debug] Exception {ticker_symbol}: {str(e)}")
-                            status.write(f"❌ Error {ticker_symbol}: {str(e)}")
+                            print(Fore.YELLOW + f"   [Debug] Bulk download failed, per-ticker fallback: {e}")
+                    fetch = with_script_run_ctx(lambda t: get_cached_market_data(t, daily_histories.get(t.upper())))
+                    
+                    # Descarga concurrente: cada ticker se reporta en cuanto termina
+                    status.update(label=f"⏳ Scanning {len(selected_tickers)} assets...", state="running")
+                    for ticker_symbol, data_bundle, error in iter_market_data(selected_tickers, fetch=fetch):
+                        if error:
+                            print(Fore.RED + f"   [Debug] Error {ticker_symbol}: {error}")
+                            status.write(f"⚠️ Data Error {ticker_symbol}: {error}")
                             failed_tickers.append(ticker_symbol)
+                        else:
+                            tickers_data[ticker_symbol] = data_bundle
+                            status.write(f"✅ {ticker_symbol}: ${data_bundle['daily'].get('price')} | Trend: {data_bundle['daily'].get('trend')}")
+                        status.update(label=f"⏳ Scanned {len(tickers_data) + len(failed_tickers)}/{len(set(selected_tickers))} assets...", state="running")
+                    
+                    # Keep the user's ticker order for the reports, regardless of completion order
+                    tickers_data = {t: tickers_data[t] for t in selected_tickers if t in tickers_data}
                     
                     if not tickers_data:
                         status.update(label="❌ Data Acquisition Failed", state="error")
@@ -497,14 +564,17 @@ def main():
                     
                     status.write(f"🧠 **Phase 2: Engaging Portfolio Manager Agent ({model_info})...**")
                     
-                    # Generar recomendación
+                    # Generar recomendación (el veredicto final se va mostrando mientras se genera)
+                    live_verdict = status.empty()
                     recommendation, excel_data, metrics = recommend_capital_distribution(
                         capital_amount=capital_amount,
                         tickers_data=tickers_data,
                         model=selected_model,
                         reasoning_effort=reasoning_effort,
-                        progress_callback=lambda msg: status.write(msg)
+                        progress_callback=lambda msg: status.write(msg),
+                        on_token=stream_renderer(live_verdict)
                     )
+                    live_verdict.empty()
                     
                     status.write("✅ Strategy Generated.")
                     status.update(label="✨ Allocation Strategy Ready", state="complete", expanded=False)
@@ -529,7 +599,8 @@ def main():
             """, unsafe_allow_html=True)
             
             if metrics:
-                st.caption(f"⏱️ Tiempo: {metrics['execution_time']:.2f}s | 🪙 Tokens: {metrics['token_usage']['total_tokens']} (Prompt: {metrics['token_usage']['prompt_tokens']}, Compl: {metrics['token_usage']['completion_tokens']})")
+                cache_note = f" | ♻️ Análisis en caché: {metrics['cache_hits']}/{len(tickers_data)}" if metrics.get('cache_hits') else ""
+                st.caption(f"⏱️ Tiempo: {metrics['execution_time']:.2f}s | 🪙 Tokens: {metrics['token_usage']['total_tokens']} (Prompt: {metrics['token_usage']['prompt_tokens']}, Compl: {metrics['token_usage']['completion_tokens']}){cache_note}{latency_note(metrics)}")
             
             # Mostrar resumen de señales técnicas
             with st.expander("🔍 Ver Detalles Técnicos de Cada Activo"):
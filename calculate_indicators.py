@@ -1,5 +1,34 @@
+import math
 import numpy as np # Necesitamos numpy para cálculos vectoriales
 import pandas as pd
+from collections import deque
+
+# Columnas que agrega calculate_indicators(), en el mismo orden
+INDICATOR_COLUMNS = [
+    'EMA_20', 'EMA_50', 'EMA_200', 'RSI', 'MACD', 'MACD_Signal', 'MACD_Hist',
+    'BB_Upper', 'BB_Lower', 'ATR', 'ADX', 'Stoch_K', 'Stoch_D', 'OBV'
+]
+
+# Peso máximo que puede conservar la semilla de un indicador recursivo tras el calentamiento
+WARMUP_TOLERANCE = 1e-3
+
+def _decay_bars(alpha, tolerance):
+    """Bars until the weight (1 - alpha)**n of an EMA's seed drops below `tolerance`"""
+    return math.ceil(math.log(tolerance) / math.log(1 - alpha))
+
+def warmup_bars(tolerance=WARMUP_TOLERANCE):
+    """
+    Minimum history for the recursive indicators to forget their seed: after this many
+    bars the seed weighs less than `tolerance` in every column (~691 bars at 1e-3,
+    set by EMA_200). Chained smoothings (Wilder ADX, MACD signal) add up their decays.
+    OBV is a running sum: its level depends on where the history starts, only its
+    changes are comparable.
+    """
+    return max(
+        _decay_bars(2 / 201, tolerance),                                  # EMA_200
+        2 * 14 + 2 * _decay_bars(1 / 14, tolerance),                      # ADX (Wilder over Wilder)
+        _decay_bars(2 / 27, tolerance) + _decay_bars(2 / 10, tolerance),  # MACD_Signal
+    )
 
 def wilder_smoothing(data, period=14):
     """
@@ -9,66 +38,83 @@ def wilder_smoothing(data, period=14):
     First value uses simple moving average as seed.
     
     This is different from EMA and produces values matching TradingView/Yahoo Finance.
+    Once seeded, the recurrence is exactly ewm(alpha=1/period, adjust=False), so it runs
+    vectorized in pandas instead of a per-row Python loop. Accepts a Series or a
+    DataFrame (each column smoothed independently).
     """
-    result = pd.Series(index=data.index, dtype=float)
-    
-    # First value: simple moving average
-    result.iloc[period - 1] = data.iloc[:period].mean()
+    values = data.to_numpy(dtype=float).reshape(len(data), -1)
+    smoothed = np.full(values.shape, np.nan)
     
-    # Subsequent values: Wilder's smoothing
-    for i in range(period, len(data)):
-        result.iloc[i] = (result.iloc[i - 1] * (period - 1) + data.iloc[i]) / period
+    if len(data) >= period:
+        # First value: simple moving average (skips NaN, e.g. the first diff() of +DM/-DM)
+        seed = pd.DataFrame(values[:period]).mean().to_numpy()
+        
+        # Subsequent values: Wilder's smoothing seeded with the SMA
+        segment = np.vstack([seed, values[period:]])
+        rma = pd.DataFrame(segment).ewm(alpha=1 / period, adjust=False).mean().to_numpy()
+        
+        # A NaN seed or a NaN inside the recurrence propagates to every later value
+        smoothed[period - 1:] = np.where(np.cumsum(np.isnan(segment), axis=0) > 0, np.nan, rma)
     
-    return result
+    if isinstance(data, pd.DataFrame):
+        return pd.DataFrame(smoothed, index=data.index, columns=data.columns)
+    return pd.Series(smoothed[:, 0], index=data.index, dtype=float)
 
-def calculate_indicators(hist):
+def _indicator_columns(high, low, close, volume):
+    """
+    Core indicator math shared by calculate_indicators() and calculate_indicators_batch().
+    Works on one ticker (Series) or on many tickers at once (one DataFrame column per ticker).
+    Returns {column: values} in INDICATOR_COLUMNS order.
+    """
+    out = {}
+    
     # 1. EMAs existentes
-    hist['EMA_20'] = hist['Close'].ewm(span=20, adjust=False).mean()
-    hist['EMA_50'] = hist['Close'].ewm(span=50, adjust=False).mean()
-    hist['EMA_200'] = hist['Close'].ewm(span=200, adjust=False).mean()
+    out['EMA_20'] = close.ewm(span=20, adjust=False).mean()
+    out['EMA_50'] = close.ewm(span=50, adjust=False).mean()
+    out['EMA_200'] = close.ewm(span=200, adjust=False).mean()
     
     # 2. RSI existente
-    delta = hist['Close'].diff()
+    delta = close.diff()
     gain = (delta.where(delta > 0, 0)).ewm(alpha=1/14, adjust=False).mean()
     loss = (-delta.where(delta < 0, 0)).ewm(alpha=1/14, adjust=False).mean()
     rs = gain / loss
-    hist['RSI'] = 100 - (100 / (1 + rs))
+    out['RSI'] = 100 - (100 / (1 + rs))
     
     # 3. MACD existente
-    ema12 = hist['Close'].ewm(span=12, adjust=False).mean()
-    ema26 = hist['Close'].ewm(span=26, adjust=False).mean()
-    hist['MACD'] = ema12 - ema26
-    hist['MACD_Signal'] = hist['MACD'].ewm(span=9, adjust=False).mean()
-    hist['MACD_Hist'] = hist['MACD'] - hist['MACD_Signal']
+    ema12 = close.ewm(span=12, adjust=False).mean()
+    ema26 = close.ewm(span=26, adjust=False).mean()
+    out['MACD'] = ema12 - ema26
+    out['MACD_Signal'] = out['MACD'].ewm(span=9, adjust=False).mean()
+    out['MACD_Hist'] = out['MACD'] - out['MACD_Signal']
     
     # --- NUEVO: BANDAS DE BOLLINGER (Volatilidad) ---
     # Media simple de 20 días
-    sma_20 = hist['Close'].rolling(window=20).mean()
+    sma_20 = close.rolling(window=20).mean()
     # Desviación estándar
-    rstd = hist['Close'].rolling(window=20).std()
-    hist['BB_Upper'] = sma_20 + 2 * rstd
-    hist['BB_Lower'] = sma_20 - 2 * rstd
+    rstd = close.rolling(window=20).std()
+    out['BB_Upper'] = sma_20 + 2 * rstd
+    out['BB_Lower'] = sma_20 - 2 * rstd
     
     # --- NUEVO: ATR (Average True Range) para Riesgo ---
-    high_low = hist['High'] - hist['Low']
-    high_close = np.abs(hist['High'] - hist['Close'].shift())
-    low_close = np.abs(hist['Low'] - hist['Close'].shift())
-    ranges = pd.concat([high_low, high_close, low_close], axis=1)
-    true_range = np.max(ranges, axis=1)
+    high_low = high - low
+    high_close = np.abs(high - close.shift())
+    low_close = np.abs(low - close.shift())
+    # fmax ignores NaN like max(axis=1) on the concatenated ranges (first bar has no previous close)
+    true_range = np.fmax(np.fmax(high_low, high_close), low_close)
     # Use Wilder smoothing for ATR (industry standard)
-    hist['ATR'] = wilder_smoothing(true_range, period=14)
+    out['ATR'] = wilder_smoothing(true_range, period=14)
 
     # --- NUEVO: ADX (Average Directional Index) ---
     # Wilder's ADX calculation (industry standard matching TradingView/Yahoo)
-    plus_dm = hist['High'].diff()
-    minus_dm = hist['Low'].diff()
+    plus_dm = high.diff()
+    minus_dm = low.diff()
     plus_dm[plus_dm < 0] = 0
     minus_dm[minus_dm > 0] = 0
     
     # Smooth the directional movements and true range using Wilder's method
     smoothed_plus_dm = wilder_smoothing(plus_dm, period=14)
     smoothed_minus_dm = wilder_smoothing(minus_dm.abs(), period=14)
-    smoothed_tr = wilder_smoothing(true_range, period=14)
+    smoothed_tr = out['ATR']  # Same Wilder smoothing of the true range
     
     # Calculate +DI and -DI
     plus_di = 100 * (smoothed_plus_dm / smoothed_tr)
@@ -78,15 +124,290 @@ def calculate_indicators(hist):
     dx = 100 * np.abs((plus_di - minus_di) / (plus_di + minus_di))
     
     # ADX is Wilder smoothing of DX
-    hist['ADX'] = wilder_smoothing(dx, period=14)
+    out['ADX'] = wilder_smoothing(dx, period=14)
 
     # --- NUEVO: Stochastic Oscillator ---
-    low_min = hist['Low'].rolling(14).min()
-    high_max = hist['High'].rolling(14).max()
-    hist['Stoch_K'] = 100 * ((hist['Close'] - low_min) / (high_max - low_min))
-    hist['Stoch_D'] = hist['Stoch_K'].rolling(3).mean()
+    low_min = low.rolling(14).min()
+    high_max = high.rolling(14).max()
+    out['Stoch_K'] = 100 * ((close - low_min) / (high_max - low_min))
+    out['Stoch_D'] = out['Stoch_K'].rolling(3).mean()
 
     # --- NUEVO: OBV (On-Balance Volume) ---
-    hist['OBV'] = (np.sign(hist['Close'].diff()) * hist['Volume']).fillna(0).cumsum()
+    out['OBV'] = (np.sign(close.diff()) * volume).fillna(0).cumsum()
+
+    return out
+
+def calculate_indicators(hist):
+    for name, values in _indicator_columns(hist['High'], hist['Low'], hist['Close'], hist['Volume']).items():
+        hist[name] = values
+    return hist
+
+# Columnas booleanas de la estrategia "Golden Trend Momentum" que agrega add_signal_columns()
+SIGNAL_COLUMNS = ['MACD_Cross_Up', 'MACD_Cross_Down', 'Buy_Signal', 'Sell_Signal']
+
+def add_signal_columns(hist):
+    """
+    "Golden Trend Momentum" signals on an indicator frame, added in place (no copy):
+    - Buy: Close > EMA_200 (uptrend), MACD crosses above its signal, RSI < 70
+    - Sell: Close < EMA_200 (downtrend), MACD crosses below its signal, RSI > 30
+    Computed once per history in the data pipeline so the chart only reads them.
+    """
+    macd = hist['MACD'].to_numpy(dtype=float)
+    signal = hist['MACD_Signal'].to_numpy(dtype=float)
+    close = hist['Close'].to_numpy(dtype=float)
+    ema_200 = hist['EMA_200'].to_numpy(dtype=float)
+    rsi = hist['RSI'].to_numpy(dtype=float)
+    
+    # A cross needs the previous bar on the other side (NaN compares False, like shift(1))
+    cross_up = np.zeros(len(hist), dtype=bool)
+    cross_down = np.zeros(len(hist), dtype=bool)
+    cross_up[1:] = (macd[1:] > signal[1:]) & (macd[:-1] <= signal[:-1])
+    cross_down[1:] = (macd[1:] < signal[1:]) & (macd[:-1] >= signal[:-1])
+    
+    hist['MACD_Cross_Up'] = cross_up
+    hist['MACD_Cross_Down'] = cross_down
+    hist['Buy_Signal'] = (close > ema_200) & cross_up & (rsi < 70)
+    hist['Sell_Signal'] = (close < ema_200) & cross_down & (rsi > 30)
+    return hist
 
-    return hist
\ No newline at end of file
+def calculate_indicators_batch(panel):
+    """
+    Computes the calculate_indicators() columns for many tickers in one vectorized pass.
+    
+    `panel` is a wide frame with MultiIndex columns (field, ticker), the layout of
+    yf.download([...]), or (ticker, field) as returned with group_by='ticker'.
+    Returns {ticker: DataFrame} with the OHLCV fields plus INDICATOR_COLUMNS, the same
+    values calculate_indicators() gives on each ticker's own history.
+    Tickers without any Close data are omitted.
+    """
+    if 'Close' not in panel.columns.get_level_values(0):
+        panel = panel.swaplevel(axis=1)
+    
+    fields = list(panel.columns.get_level_values(0).unique())
+    fields = [f for f in ['Open', 'High', 'Low', 'Close', 'Volume'] if f in fields] + \
+             [f for f in fields if f not in ['Open', 'High', 'Low', 'Close', 'Volume']]
+    
+    # Tickers with the same trading calendar (and listing date) are computed together on
+    # exactly their own rows, so weekends/holidays of other markets never enter the EMAs
+    valid = panel['Close'].notna()
+    calendars = {}
+    for ticker in valid.columns:
+        mask = valid[ticker].to_numpy()
+        if mask.any():
+            calendars.setdefault(mask.tobytes(), (mask, []))[1].append(ticker)
+    
+    results = {}
+    for mask, tickers in calendars.values():
+        index = panel.index[mask]
+        raw = {f: panel[f].loc[mask, tickers].to_numpy(dtype=float) for f in fields}
+        # One contiguous 2D block per field keeps pandas' ewm/rolling/where vectorized across tickers
+        wide = {f: pd.DataFrame(raw[f], index=index, columns=tickers) for f in ['High', 'Low', 'Close', 'Volume']}
+        columns = _indicator_columns(wide['High'], wide['Low'], wide['Close'], wide['Volume'])
+        indicators = {name: values.to_numpy(dtype=float) for name, values in columns.items()}
+        
+        for j, ticker in enumerate(tickers):
+            data = np.column_stack([raw[f][:, j] for f in fields] + [indicators[n][:, j] for n in INDICATOR_COLUMNS])
+            results[ticker] = pd.DataFrame(data, index=index, columns=fields + INDICATOR_COLUMNS)
+    
+    return results
+
+def _ema_step(prev, value, alpha):
+    """One step of ewm(alpha=alpha, adjust=False)"""
+    return (1 - alpha) * prev + alpha * value
+
+def _wilder_step(prev, value, period=14):
+    """One step of wilder_smoothing()"""
+    return (prev * (period - 1) + value) / period
+
+class IncrementalIndicators:
+    """
+    Stateful version of calculate_indicators() for appending new bars without
+    recomputing the whole history.
+    
+    Carries the last EMA/RMA values, the rolling-window buffers (Bollinger, Stochastic)
+    and the OBV running sum, so update() costs O(new rows): it returns just the new rows,
+    which are kept as chunks and only assembled into the full frame when `hist` is read.
+    Re-sending the last bar (e.g. today's candle during the session) replaces it instead
+    of duplicating it. Bars older than the last one, or a history too short to be warmed
+    up, fall back to a full calculate_indicators() pass.
+    """
+    # ADX needs two Wilder warm-ups (DX from bar 14, ADX from bar 27) plus one bar to roll back
+    MIN_BARS = 2 * 14
+    MAX_CHUNKS = 64  # Appended chunks merged together beyond this (bounds the list, not the base)
+    
+    def __init__(self, hist):
+        self._chunks = [calculate_indicators(hist)]
+        self._rebuild_state()
+    
+    @property
+    def hist(self):
+        """Full frame with every indicator column (assembled from the chunks on demand)"""
+        if len(self._chunks) > 1:
+            self._chunks = [pd.concat(self._chunks)]
+        return self._chunks[0]
+    
+    def _rebuild_state(self):
+        """Extracts the recurrence state at the last two bars from a fully computed frame"""
+        self._state = None
+        self._prev_state = None
+        if len(self.hist) < self.MIN_BARS:
+            return
+        
+        close = self.hist['Close']
+        delta = close.diff()
+        plus_dm = self.hist['High'].diff()
+        minus_dm = self.hist['Low'].diff()
+        plus_dm[plus_dm < 0] = 0
+        minus_dm[minus_dm > 0] = 0
+        components = {
+            'ema_12': close.ewm(span=12, adjust=False).mean(),
+            'ema_26': close.ewm(span=26, adjust=False).mean(),
+            'avg_gain': (delta.where(delta > 0, 0)).ewm(alpha=1/14, adjust=False).mean(),
+            'avg_loss': (-delta.where(delta < 0, 0)).ewm(alpha=1/14, adjust=False).mean(),
+            'plus_dm': wilder_smoothing(plus_dm, period=14),
+            'minus_dm': wilder_smoothing(minus_dm.abs(), period=14),
+        }
+        self._state = self._state_at(components, len(self.hist) - 1)
+        self._prev_state = self._state_at(components, len(self.hist) - 2)
+    
+    def _state_at(self, components, i):
+        h = self.hist
+        state = {
+            'close': h['Close'].iloc[i],
+            'high': h['High'].iloc[i],
+            'low': h['Low'].iloc[i],
+            'ema_20': h['EMA_20'].iloc[i],
+            'ema_50': h['EMA_50'].iloc[i],
+            'ema_200': h['EMA_200'].iloc[i],
+            'macd_signal': h['MACD_Signal'].iloc[i],
+            'atr': h['ATR'].iloc[i],
+            'adx': h['ADX'].iloc[i],
+            'obv': h['OBV'].iloc[i],
+            'closes': deque(h['Close'].iloc[i - 19:i + 1].to_numpy(), maxlen=20),
+            'highs': deque(h['High'].iloc[i - 13:i + 1].to_numpy(), maxlen=14),
+            'lows': deque(h['Low'].iloc[i - 13:i + 1].to_numpy(), maxlen=14),
+            'stoch_k': deque(h['Stoch_K'].iloc[i - 2:i + 1].to_numpy(), maxlen=3),
+        }
+        for name, series in components.items():
+            state[name] = series.iloc[i]
+        return state
+    
+    @staticmethod
+    def _copy_state(state):
+        return {k: deque(v, maxlen=v.maxlen) if isinstance(v, deque) else v for k, v in state.items()}
+    
+    @staticmethod
+    def _step(state, high, low, close, volume):
+        """Advances the state by one bar and returns its indicator values (INDICATOR_COLUMNS order)"""
+        prev_close = state['close']
+        
+        # EMAs y MACD
+        state['ema_20'] = _ema_step(state['ema_20'], close, 2 / 21)
+        state['ema_50'] = _ema_step(state['ema_50'], close, 2 / 51)
+        state['ema_200'] = _ema_step(state['ema_200'], close, 2 / 201)
+        state['ema_12'] = _ema_step(state['ema_12'], close, 2 / 13)
+        state['ema_26'] = _ema_step(state['ema_26'], close, 2 / 27)
+        macd = state['ema_12'] - state['ema_26']
+        state['macd_signal'] = _ema_step(state['macd_signal'], macd, 2 / 10)
+        
+        # RSI
+        delta = close - prev_close
+        state['avg_gain'] = _ema_step(state['avg_gain'], delta if delta > 0 else 0.0, 1 / 14)
+        state['avg_loss'] = _ema_step(state['avg_loss'], -delta if delta < 0 else 0.0, 1 / 14)
+        rsi = 100 - (100 / (1 + state['avg_gain'] / state['avg_loss']))
+        
+        # Bollinger
+        state['closes'].append(close)
+        window = np.fromiter(state['closes'], dtype=float)
+        sma_20 = window.mean()
+        rstd = window.std(ddof=1)
+        
+        # ATR / ADX
+        true_range = np.nanmax([high - low, abs(high - prev_close), abs(low - prev_close)])
+        state['atr'] = _wilder_step(state['atr'], true_range)
+        plus_dm = high - state['high']
+        minus_dm = low - state['low']
+        plus_dm = 0.0 if plus_dm < 0 else plus_dm
+        minus_dm = 0.0 if minus_dm > 0 else minus_dm
+        state['plus_dm'] = _wilder_step(state['plus_dm'], plus_dm)
+        state['minus_dm'] = _wilder_step(state['minus_dm'], abs(minus_dm))
+        plus_di = 100 * (state['plus_dm'] / state['atr'])
+        minus_di = 100 * (state['minus_dm'] / state['atr'])
+        dx = 100 * np.abs((plus_di - minus_di) / (plus_di + minus_di))
+        state['adx'] = _wilder_step(state['adx'], dx)
+        
+        # Stochastic
+        state['highs'].append(high)
+        state['lows'].append(low)
+        low_min = min(state['lows'])
+        high_max = max(state['highs'])
+        stoch_k = 100 * ((close - low_min) / (high_max - low_min))
+        state['stoch_k'].append(stoch_k)
+        stoch_d = np.fromiter(state['stoch_k'], dtype=float).mean()
+        
+        # OBV
+        obv_change = np.sign(delta) * volume
+        if not np.isnan(obv_change):
+            state['obv'] = state['obv'] + obv_change
+        
+        state['close'] = close
+        state['high'] = high
+        state['low'] = low
+        
+        return [
+            state['ema_20'], state['ema_50'], state['ema_200'], rsi,
+            macd, state['macd_signal'], macd - state['macd_signal'],
+            sma_20 + 2 * rstd, sma_20 - 2 * rstd,
+            state['atr'], state['adx'], stoch_k, stoch_d, state['obv']
+        ]
+    
+    def update(self, new_bars):
+        """
+        Appends one or more OHLCV rows (same columns as yfinance history()) and
+        returns those rows with every indicator column filled in (the full frame
+        is `hist`).
+        """
+        columns = self._chunks[0].columns
+        if new_bars is None or new_bars.empty:
+            return self._chunks[0].iloc[:0]
+        
+        if not (new_bars.index.is_unique and new_bars.index.is_monotonic_increasing):
+            new_bars = new_bars[~new_bars.index.duplicated(keep='last')].sort_index()
+        last_ts = self._chunks[-1].index[-1]
+        
+        if self._state is None or new_bars.index[0] < last_ts:
+            # Sin estado suficiente o barras fuera de orden: recalculamos todo
+            hist = self.hist
+            raw_columns = [col for col in hist.columns if col not in INDICATOR_COLUMNS]
+            kept = hist.loc[~hist.index.isin(new_bars.index), raw_columns]
+            self._chunks = [calculate_indicators(pd.concat([kept, new_bars]).sort_index())]
+            self._rebuild_state()
+            return self._chunks[0].loc[new_bars.index]
+        
+        if new_bars.index[0] == last_ts:
+            # The last bar is being revised (intraday refresh): roll back one step
+            state = self._copy_state(self._prev_state)
+            self._chunks[-1] = self._chunks[-1].iloc[:-1]  # Row slice, no copy of the data
+            if self._chunks[-1].empty:
+                self._chunks.pop()
+        else:
+            state = self._copy_state(self._state)
+        
+        rows = []
+        prev_state = state
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ohlcv = [new_bars[col].to_numpy(dtype=float) for col in ('High', 'Low', 'Close', 'Volume')]
+            for high, low, close, volume in zip(*ohlcv):
+                prev_state = self._copy_state(state)
+                rows.append(self._step(state, high, low, close, volume))
+        
+        # Built column by column in one constructor (assigning into a reindexed frame costs more than the maths)
+        values = dict(zip(INDICATOR_COLUMNS, np.array(rows, dtype=float).T))
+        appended = pd.DataFrame({col: values[col] if col in values else new_bars[col].to_numpy() if col in new_bars.columns else np.nan
+                                 for col in columns}, index=new_bars.index)
+        self._chunks.append(appended)
+        if len(self._chunks) > self.MAX_CHUNKS:
+            self._chunks = [self._chunks[0], pd.concat(self._chunks[1:])]
+        self._state = state
+        self._prev_state = prev_state
+        return appended
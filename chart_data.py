@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+# Series de línea que dibuja create_dashboard (las velas y las señales van aparte)
+LINE_COLUMNS = ['BB_Upper', 'BB_Lower', 'EMA_50', 'EMA_200', 'RSI', 'Stoch_K', 'Stoch_D', 'MACD', 'MACD_Signal', 'MACD_Hist']
+MACD_HIST_COLORS = ('#238636', '#da3633')  # (>= 0, < 0)
+
+def lttb_indices(values, n_out):
+    """
+    Largest-Triangle-Three-Buckets: positions of `n_out` points of `values` that keep
+    the visual shape of the line (peaks and troughs survive, flat stretches thin out).
+    First and last points are always kept; NaNs (indicator warm-up) are skipped.
+    """
+    values = np.asarray(values, dtype=float)
+    valid = np.flatnonzero(np.isfinite(values))
+    if n_out >= len(valid) or n_out < 3:
+        return valid
+
+    y = values[valid]
+    x = valid.astype(float)
+    edges = np.linspace(1, len(valid) - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, len(valid) - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (len(valid) - 1, len(valid))
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return valid[selected]
+
+def aggregate_ohlc(df, n_buckets):
+    """OHLC bars merged into `n_buckets` consecutive buckets, labelled with their first bar"""
+    if n_buckets >= len(df):
+        return df[['Open', 'High', 'Low', 'Close']]
+    starts = np.unique(np.linspace(0, len(df), n_buckets, endpoint=False).astype(int))
+    ends = np.append(starts[1:], len(df)) - 1
+    return pd.DataFrame({
+        'Open': df['Open'].to_numpy()[starts],
+        'High': np.fmax.reduceat(df['High'].to_numpy(dtype=float), starts),
+        'Low': np.fmin.reduceat(df['Low'].to_numpy(dtype=float), starts),
+        'Close': df['Close'].to_numpy()[ends],
+    }, index=df.index[starts])
+
+def prepare_chart_data(df, window_bars=252, overview_points=300):
+    """
+    Chart payload for create_dashboard: the last `window_bars` bars at full resolution
+    and everything before them reduced to about `overview_points` points (OHLC buckets
+    for the candles, LTTB for the lines). Buy/sell markers are kept as is (sparse).
+    Returns a dict with 'candles', 'lines' {column: Series}, 'macd_colors', 'buy',
+    'sell', 'window_start' and the full 'start'/'end' of the history.
+    """
+    split = max(0, len(df) - window_bars)
+    overview, window = df.iloc[:split], df.iloc[split:]
+
+    candles = pd.concat([aggregate_ohlc(overview, overview_points), window[['Open', 'High', 'Low', 'Close']]])
+    lines = {}
+    for col in LINE_COLUMNS:
+        if col in df.columns:
+            head = overview[col].iloc[lttb_indices(overview[col].to_numpy(), overview_points)]
+            lines[col] = pd.concat([head, window[col]])
+
+    macd_colors = None
+    if 'MACD_Hist' in lines:
+        macd_colors = np.where(lines['MACD_Hist'].to_numpy() >= 0, *MACD_HIST_COLORS)
+
+    return {
+        'candles': candles,
+        'lines': lines,
+        'macd_colors': macd_colors,
+        'buy': df.loc[df['Buy_Signal'], 'Close'] if 'Buy_Signal' in df.columns else df['Close'].iloc[:0],
+        'sell': df.loc[df['Sell_Signal'], 'Close'] if 'Sell_Signal' in df.columns else df['Close'].iloc[:0],
+        'window_start': window.index[0] if len(window) else df.index[0],
+        'start': df.index[0],
+        'end': df.index[-1],
+    }
+
+def history_version(df):
+    """
+    Cheap identity of a history's data: last bar timestamp, its close and the bar count.
+    Changes whenever a bar is added or the live (partial) last bar moves.
+    """
+    if df is None or df.empty:
+        return None
+    return str(df.index[-1]), float(df['Close'].iloc[-1]), len(df)
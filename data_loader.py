@@ -1,7 +1,16 @@
 import yfinance as yf
 import pandas as pd
 import numpy as np
-from calculate_indicators import calculate_indicators
+import os
+import re
+import time
+import threading
+import concurrent.futures
+from datetime import datetime
+import math
+from calculate_indicators import (calculate_indicators, calculate_indicators_batch, add_signal_columns, warmup_bars,
+                                  INDICATOR_COLUMNS, SIGNAL_COLUMNS)
+from disk_cache import CACHE_DIR, DiskCache
 from colorama import Fore, Style, init
 
 init(autoreset=True)
@@ -70,18 +79,424 @@ def classify_trend(hist):
         else:
             return "Bajista Débil"
 
-def get_market_data(ticker, interval="1d", fetch_news=True):
+def _period_start(period, tz=None):
+    """Oldest timestamp covered by a yfinance period string like '5y', '6mo' or '30d'"""
+    match = re.fullmatch(r"(\d+)(y|mo|wk|d)", period)
+    if not match:
+        return None
+    amount, unit = int(match.group(1)), match.group(2)
+    offset = {
+        "y": pd.DateOffset(years=amount),
+        "mo": pd.DateOffset(months=amount),
+        "wk": pd.DateOffset(weeks=amount),
+        "d": pd.DateOffset(days=amount),
+    }[unit]
+    return pd.Timestamp.now(tz=tz).normalize() - offset
+
+# Rangos que la API de Yahoo acepta tal cual en period=; el resto se pide con start=
+YAHOO_RANGES = {"1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "ytd", "max"}
+BARS_PER_YEAR = {"1d": 252, "1wk": 52, "1mo": 12}
+# Análisis: calentamiento de EMA_200/ADX + ventana de 20 barras de la pendiente de EMA_200 (classify_trend)
+ANALYSIS_BARS = warmup_bars() + 20
+# El gráfico muestra más historia; se descarga aparte y solo cuando se dibuja
+CHART_PERIOD = "5y"
+# Semanal (El Juez), igual en barras nativas 1wk y remuestreadas del diario: ~104 barras.
+# Warm-up sizing would need ~14y of weekly bars (more than the 3y daily history holds),
+# so the weekly EMA_200 (~35% of its seed left) and ADX (~0.4%) do NOT reach
+# WARMUP_TOLERANCE (RSI/MACD do): read them as trend direction/strength, not exact levels.
+WEEKLY_PERIOD = "2y"
+
+def lookback_period(interval="1d", bars=ANALYSIS_BARS):
+    """
+    Shortest whole-year period with at least `bars` bars of `interval` (e.g. '3y' for
+    daily). Weekly is fixed at WEEKLY_PERIOD on both weekly paths (see above).
+    """
+    if interval == "1wk":
+        return WEEKLY_PERIOD
+    return f"{math.ceil(bars / BARS_PER_YEAR.get(interval, 252))}y"
+
+def _history_kwargs(period):
+    """period= for the ranges Yahoo knows, otherwise the equivalent start= date"""
+    if period in YAHOO_RANGES:
+        return {"period": period}
+    return {"start": _period_start(period).strftime("%Y-%m-%d")}
+
+def _history_cache_path(ticker, interval):
+    safe_ticker = re.sub(r"[^A-Za-z0-9_.-]", "_", ticker.upper())
+    return os.path.join(CACHE_DIR, "ohlcv", f"{safe_ticker}_{interval}.parquet")
+
+def _read_history_cache(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception as e:
+        print(Fore.YELLOW + f"   [Cache] ⚠️ Caché OHLCV ilegible ({path}), se descarga de nuevo: {e}")
+        return None
+
+def _write_history_cache(path, hist):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        hist.to_parquet(tmp_path)
+        os.replace(tmp_path, path)  # Atomic: a concurrent reader never sees a half-written file
+    except Exception as e:
+        print(Fore.YELLOW + f"   [Cache] ⚠️ No se pudo guardar la caché OHLCV: {e}")
+
+def _download_full_history(stock, path, period, interval):
+    hist = stock.history(interval=interval, timeout=10, **_history_kwargs(period))
+    start = _period_start(period, tz=hist.index.tz) if hist is not None and not hist.empty else None
+    if start is not None:
+        hist.attrs["covers_from"] = start.isoformat()
+        _write_history_cache(path, hist)
+    return hist
+
+def _covering_store(ticker, period, interval):
+    """
+    (path, stored history, period start). The stored history is None when the store
+    can't be extended incrementally for `period` (missing, unreadable, or it holds a
+    shorter window than requested) and a full download is needed.
+    """
+    path = _history_cache_path(ticker, interval)
+    cached = _read_history_cache(path)
+    if cached is None or len(cached) < 2 or "covers_from" not in cached.attrs:
+        return path, None, None
+    start = _period_start(period, tz=cached.index.tz)
+    if start is None or pd.Timestamp(cached.attrs["covers_from"]) > start:
+        return path, None, None
+    return path, cached, start
+
+def _merge_tail(ticker, interval, path, cached, tail):
+    """
+    Stored history extended with `tail` (which starts at the second-to-last stored bar)
+    and written back. None if the overlap bar changed: Yahoo re-adjusted the history
+    (dividend/split) and a full download is needed.
+    """
+    overlap_start = cached.index[-2]
+    if overlap_start in tail.index and not np.isclose(tail.at[overlap_start, "Close"], cached.at[overlap_start, "Close"], rtol=1e-6):
+        print(Fore.YELLOW + f"   [Cache] 🔄 Historial de {ticker} reajustado por Yahoo (dividendo/split), descarga completa...")
+        return None
+    
+    merged = pd.concat([cached, tail.reindex(columns=cached.columns)])
+    merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+    # The store keeps everything since covers_from (shared by the 3y analysis and 5y chart
+    # windows); callers trim their copy to the requested period
+    merged.attrs["covers_from"] = cached.attrs["covers_from"]
+    _write_history_cache(path, merged)
+    print(Fore.CYAN + f"   [Cache] 💾 {ticker} ({interval}): {len(tail)} barras descargadas, {len(merged)} en caché.")
+    return merged
+
+def get_history(stock, ticker, period="5y", interval="1d"):
+    """
+    stock.history() backed by a persistent Parquet store keyed by ticker + interval.
+    
+    Only the missing tail since the last stored bar is downloaded and merged
+    (de-duplicated on the index, newest wins). The overlap re-downloads the last two
+    stored bars: the last one may have been a partial session, and a change in the
+    previous one means Yahoo re-adjusted the history (dividend/split), which forces a
+    full download. Returns the same window `period` would return.
+    """
+    path, cached, start = _covering_store(ticker, period, interval)
+    if cached is None:
+        return _download_full_history(stock, path, period, interval)
+    
+    try:
+        tail = stock.history(start=cached.index[-2].strftime("%Y-%m-%d"), interval=interval, timeout=10)
+    except Exception as e:
+        print(Fore.YELLOW + f"   [Cache] ⚠️ Falló la descarga incremental de {ticker}, usando caché local: {e}")
+        return cached.loc[cached.index >= start]
+    
+    if tail is None or tail.empty:
+        return cached.loc[cached.index >= start]
+    
+    merged = _merge_tail(ticker, interval, path, cached, tail)
+    if merged is None:
+        return _download_full_history(stock, path, period, interval)
+    return merged.loc[merged.index >= start]
+
+def _download_panel(tickers, interval, **kwargs):
+    """One batched yf.download, split into {ticker: OHLCV frame} (tickers without data omitted)"""
+    panel = yf.download(tickers, interval=interval, group_by='ticker', threads=True, auto_adjust=True, actions=True,
+                        progress=False, timeout=10, multi_level_index=True, **kwargs)
+    if panel is None or panel.empty:
+        return {}
+    if 'Close' in panel.columns.get_level_values(0):
+        panel = panel.swaplevel(axis=1)
+    frames = {}
+    for ticker in tickers:
+        if ticker in panel.columns.get_level_values(0):
+            hist = panel[ticker].dropna(subset=['Close'])
+            if not hist.empty:
+                frames[ticker] = hist
+    return frames
+
+def get_bulk_histories(tickers, period=None, interval="1d"):
+    """
+    Histories for a whole ticker list with batched yf.download calls (threads=True)
+    instead of one stock.history() per ticker, with the calculate_indicators() columns
+    already computed (calculate_indicators_batch on the combined panel).
+    
+    Goes through the OHLCV store like get_history: tickers whose store covers `period`
+    download only their tail (one batched call for all of them) and the rest the full
+    period (another one); both are merged/written into the store.
+    Returns {ticker: DataFrame}; tickers Yahoo returned nothing for are omitted, so
+    callers can fall back to the per-ticker path for them.
+    `period` defaults to the analysis lookback (see lookback_period).
+    """
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    if not tickers:
+        return {}
+    period = period or lookback_period(interval)
+    
+    raw, incremental, full = {}, {}, []
+    for ticker in tickers:
+        path, cached, start = _covering_store(ticker, period, interval)
+        if cached is None:
+            full.append(ticker)
+        else:
+            incremental[ticker] = (path, cached, start)
+    
+    if incremental:
+        since = min(cached.index[-2] for _, cached, _ in incremental.values())
+        print(Fore.CYAN + f"   [Data] 📡 Descarga agrupada de la cola de {len(incremental)} tickers ({interval}, desde {since:%Y-%m-%d})...")
+        try:
+            tails = _download_panel(list(incremental), interval, start=since.strftime("%Y-%m-%d"))
+        except Exception as e:
+            print(Fore.YELLOW + f"   [Cache] ⚠️ Falló la descarga incremental agrupada, usando caché local: {e}")
+            tails = {}
+        for ticker, (path, cached, start) in incremental.items():
+            merged = cached
+            if ticker in tails:
+                merged = _merge_tail(ticker, interval, path, cached, tails[ticker].loc[tails[ticker].index >= cached.index[-2]])
+            if merged is None:
+                full.append(ticker)
+            else:
+                raw[ticker] = merged.loc[merged.index >= start]
+    
+    if full:
+        print(Fore.CYAN + f"   [Data] 📡 Descarga agrupada de {len(full)} tickers ({interval}, {period})...")
+        for ticker, hist in _download_panel(full, interval, **_history_kwargs(period)).items():
+            start = _period_start(period, tz=hist.index.tz)
+            if start is not None:
+                hist.attrs["covers_from"] = start.isoformat()
+                _write_history_cache(_history_cache_path(ticker, interval), hist)
+            raw[ticker] = hist
+    
+    # One vectorized indicator pass per index timezone (stored histories keep their own)
+    by_tz = {}
+    for ticker, hist in raw.items():
+        by_tz.setdefault(str(hist.index.tz), {})[ticker] = hist
+    histories = {}
+    for group in by_tz.values():
+        for ticker, hist in calculate_indicators_batch(pd.concat(group, axis=1)).items():
+            histories[ticker] = add_signal_columns(hist)
+    missing = [t for t in tickers if t not in histories]
+    if missing:
+        print(Fore.YELLOW + f"   [Data] ⚠️ Sin datos en la descarga agrupada: {', '.join(missing)}")
+    return histories
+
+# --- FUNDAMENTALES: stock.info es de las llamadas más lentas de yfinance y cambia como mucho a diario ---
+FUNDAMENTALS_TTL = int(os.getenv("FUNDAMENTALS_CACHE_TTL", str(24 * 3600)))
+fundamentals_cache = DiskCache("fundamentals", ttl=FUNDAMENTALS_TTL, max_bytes=5 * 1024 * 1024)
+_fundamentals_memory = {}  # ticker -> (expires_at, fundamentals)
+_fundamentals_lock = threading.Lock()
+
+def _extract_fundamentals(info):
+    """The few stock.info fields the analysis uses (the full dict is large)"""
+    return {
+        "sector": info.get('sector', 'Desconocido'),
+        "industry": info.get('industry', 'Desconocido'),
+        "PER": info.get('forwardPE', 'N/A'),
+        "PEG": info.get('pegRatio', 'N/A'),
+        "Deuda/Equity": info.get('debtToEquity', 'N/A'),
+        "Margen": info.get('profitMargins', 0)
+    }
+
+def get_fundamentals(ticker, stock=None):
+    """
+    Sector/valuation fundamentals for `ticker`, from stock.info at most once per
+    FUNDAMENTALS_TTL: an in-process layer first, then the persistent store, then
+    Yahoo. Shared by every interval. Raises if Yahoo fails (failures aren't cached).
+    """
+    key = ticker.upper()
+    now = time.time()
+    with _fundamentals_lock:
+        entry = _fundamentals_memory.get(key)
+    if entry and entry[0] > now:
+        return entry[1]
+    
+    # The disk entry carries its fetch time: the memory copy expires with it, not a fresh TTL later
+    stored = fundamentals_cache.get(key)
+    if isinstance(stored, dict) and 'fetched_at' in stored and stored['fetched_at'] + FUNDAMENTALS_TTL > now:
+        fetched_at, fundamentals = stored['fetched_at'], stored['fundamentals']
+    else:
+        stock = stock or yf.Ticker(ticker)
+        fetched_at, fundamentals = now, _extract_fundamentals(stock.info)
+        fundamentals_cache.set(key, {'fetched_at': fetched_at, 'fundamentals': fundamentals})
+    
+    with _fundamentals_lock:
+        _fundamentals_memory[key] = (fetched_at + FUNDAMENTALS_TTL, fundamentals)
+    return fundamentals
+
+def prefetch_fundamentals(tickers, max_workers=6):
+    """
+    Warms the fundamentals cache for many tickers concurrently (yfinance has no bulk
+    stock.info endpoint). Returns {ticker: fundamentals}; failed tickers are omitted.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_ticker = {executor.submit(get_fundamentals, ticker): ticker for ticker in tickers}
+        for future in concurrent.futures.as_completed(future_to_ticker):
+            ticker = future_to_ticker[future]
+            try:
+                results[ticker] = future.result()
+            except Exception as e:
+                print(Fore.YELLOW + f"   [Data] ⚠️ No se pudieron obtener fundamentales de {ticker}: {e}")
+    return results
+
+def get_chart_history(ticker, interval="1d", period=CHART_PERIOD, compact=False):
+    """
+    Longer history with indicators for the chart, loaded only when a chart is drawn.
+    Goes through the OHLCV store, which then also serves the shorter analysis window.
+    """
+    hist = get_history(yf.Ticker(ticker), ticker, period=period, interval=interval)
+    if hist is None or hist.empty:
+        return hist
+    hist = add_signal_columns(calculate_indicators(hist))
+    return compact_history(hist) if compact else hist
+
+# --- HISTORIALES COMPACTOS: lo que el bundle guarda para la UI (gráfico y tabla de datos) ---
+BUNDLE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume'] + INDICATOR_COLUMNS + SIGNAL_COLUMNS
+
+def compact_history(hist, columns=BUNDLE_COLUMNS):
+    """
+    Copy of an indicator frame with only `columns` (Dividends, Stock Splits... dropped)
+    and the indicator columns as float32. Prices, volume and signals keep their dtype.
+    float32 keeps ~7 significant digits: the relative error per value is at most
+    2**-24 (~6e-8), far below the 2 decimals the UI and the LLM payload round to;
+    see float32_precision_error.
+    """
+    compact = hist[[col for col in columns if col in hist.columns]]
+    indicators = [col for col in INDICATOR_COLUMNS if col in compact.columns]
+    return compact.astype({col: np.float32 for col in indicators})
+
+def float32_precision_error(original, compact):
+    """Largest relative difference per float32 column between a frame and its compact copy"""
+    errors = {}
+    for col in compact.columns:
+        if compact[col].dtype != np.float32:
+            continue
+        reference = original[col].to_numpy(dtype=float)
+        diff = np.abs(compact[col].to_numpy(dtype=float) - reference)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative = np.where(reference != 0, diff / np.abs(reference), diff)
+        errors[col] = float(np.nanmax(relative)) if np.isfinite(relative).any() else 0.0
+    return errors
+
+def bundle_memory_report(bundle):
+    """Bytes held by each history frame of a multi-timeframe bundle, plus the total"""
+    report = {key: int(bundle[key].memory_usage(deep=True).sum())
+              for key in ("daily_hist", "weekly_hist") if bundle.get(key) is not None}
+    report["total"] = sum(report.values())
+    return report
+
+def _package_llm_data(ticker, hist, sector, fund_text, news_summary):
+    """Builds the compact dict the LLM sees from the last bar of an indicator frame"""
+    last = hist.iloc[-1]
+    close_price = last.get('Close', 0)
+    ema_200_val = last.get('EMA_200', 0)
+    
+    # Determine asset type for specialized analysis
+    ticker_type = "CRYPTO" if "-USD" in ticker.upper() or "BTC" in ticker.upper() or "ETH" in ticker.upper() else "STOCK"
+    
+    return {
+        "analysis_date": datetime.now().strftime("%Y-%m-%d"),  # Critical: AI needs to know TODAY's date
+        "ticker_type": ticker_type,  # Stocks vs Crypto behave differently
+        "last_updated": str(hist.index[-1].date()),  # Date tracking
+        "price": round(close_price, 2),
+        "ema_20": round(last.get('EMA_20', 0), 2),
+        "ema_50": round(last.get('EMA_50', 0), 2),
+        "ema_200": round(ema_200_val, 2),
+        "rsi": round(last.get('RSI', 50), 2),
+        "macd": round(last.get('MACD', 0), 3),
+        "macd_signal": round(last.get('MACD_Signal', 0), 3),
+        "macd_hist": round(last.get('MACD_Hist', 0), 3),
+        "atr": round(last.get('ATR', 0), 2),
+        "adx": round(last.get('ADX', 0), 2),
+        "stoch_k": round(last.get('Stoch_K', 0), 2),
+        "stoch_d": round(last.get('Stoch_D', 0), 2),
+        "obv": round(last.get('OBV', 0), 2),
+        "sector": sector,
+        "trend": classify_trend(hist),
+        "fundamentals": fund_text,
+        "news": "\n".join(news_summary) if news_summary else "Sin noticias."
+    }
+
+# Agregación OHLCV al remuestrear barras diarias
+WEEKLY_AGGREGATION = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Volume': 'sum',
+    'Dividends': 'sum',
+    'Stock Splits': 'max',
+}
+
+def resample_to_weekly(daily_hist, period=WEEKLY_PERIOD):
+    """
+    Aggregates daily bars into weekly bars laid out like Yahoo's native interval="1wk":
+    Monday-to-Sunday weeks labelled with the Monday, current week included (partial).
+    Only OHLCV columns are kept; indicators must be recomputed on the result.
+    """
+    columns = {col: agg for col, agg in WEEKLY_AGGREGATION.items() if col in daily_hist.columns}
+    weekly = daily_hist[list(columns)].resample('W-SUN').agg(columns)
+    weekly = weekly.dropna(subset=['Close'])
+    weekly.index = weekly.index - pd.Timedelta(days=6)
+    
+    start = _period_start(period, tz=weekly.index.tz) if period else None
+    if start is not None:
+        # Same window as history(period=...): the week containing `start` is the first one
+        weekly = weekly.loc[weekly.index > start - pd.Timedelta(days=7)]
+    return weekly
+
+def compare_weekly_with_yahoo(ticker, period="2y"):
+    """
+    Parity check: weekly bars derived from Yahoo's daily history vs Yahoo's native
+    weekly bars. Returns the max relative difference per OHLCV column over the
+    common weeks (the current, partial week is excluded).
+    """
+    stock = yf.Ticker(ticker)
+    native = stock.history(period=period, interval="1wk", timeout=10)
+    derived = resample_to_weekly(stock.history(period="5y", interval="1d", timeout=10), period=period)
+    
+    common = native.index.intersection(derived.index)[:-1]
+    diffs = {}
+    for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
+        reference = native.loc[common, col].abs().replace(0, np.nan)
+        diffs[col] = float(((derived.loc[common, col] - native.loc[common, col]).abs() / reference).max())
+    return pd.Series(diffs, name=ticker)
+
+def get_market_data(ticker, interval="1d", fetch_news=True, hist=None):
+    """
+    `hist` may be a history with indicators already computed for `interval`
+    (e.g. from get_bulk_histories); the download and indicator steps are then skipped.
+    The returned history carries the indicator and signal (SIGNAL_COLUMNS) columns.
+    """
     try:
         print(Fore.CYAN + f"   [Data] 📡 Iniciando descarga de datos para {ticker} ({interval})...")
         stock = yf.Ticker(ticker)
         
         # --- 1. HISTORIAL Y TÉCNICO ---
-        # Ajustamos el periodo según el intervalo para no traer demasiados datos innecesarios o muy pocos
-        period = "5y" if interval == "1d" else "2y" if interval == "1wk" else "5y"
+        # Solo la historia que necesitan los indicadores (el gráfico carga la suya con get_chart_history)
+        period = lookback_period(interval)
+        precomputed = hist is not None and not hist.empty
         
         # Download con timeout para evitar esperas largas en tickers inválidos
         try:
-            hist = stock.history(period=period, interval=interval, timeout=10)
+            if not precomputed:
+                hist = get_history(stock, ticker, period=period, interval=interval)
         except Exception as download_error:
             error_msg = f"Error al descargar datos para '{ticker}': {str(download_error)}"
             print(Fore.RED + f"   [Data] ❌ {error_msg}")
@@ -93,23 +508,19 @@ def get_market_data(ticker, interval="1d", fetch_news=True):
             print(Fore.RED + f"   [Data] ❌ {error_msg}")
             return None, None, None, error_msg
             
-        print(Fore.CYAN + "   [Data] 📐 Calculando indicadores técnicos...")
-        hist = calculate_indicators(hist)
-        last = hist.iloc[-1]
+        if not precomputed:
+            print(Fore.CYAN + "   [Data] 📐 Calculando indicadores técnicos...")
+            hist = calculate_indicators(hist)
+        if 'Buy_Signal' not in hist.columns:
+            add_signal_columns(hist)
         
         # --- 2. FUNDAMENTALES (Salud Financiera) ---
         # Solo intentamos buscar fundamentales si el ticker existe
         print(Fore.CYAN + "   [Data] 📊 Obteniendo fundamentales...")
         try:
-            info = stock.info
-            fundamentals = {
-                "PER": info.get('forwardPE', 'N/A'),
-                "PEG": info.get('pegRatio', 'N/A'),
-                "Deuda/Equity": info.get('debtToEquity', 'N/A'),
-                "Margen": info.get('profitMargins', 0)
-            }
-            sector = info.get('sector', 'Desconocido')
-            industry = info.get('industry', 'Desconocido')
+            fundamentals = get_fundamentals(ticker, stock)
+            sector = fundamentals['sector']
+            industry = fundamentals['industry']
             fund_text = f"Sector: {sector} | Industria: {industry} | PER: {fundamentals['PER']} | PEG: {fundamentals['PEG']}"
         except Exception as e:
             print(Fore.YELLOW + f"   [Data] ⚠️ No se pudieron obtener fundamentales: {e}")
@@ -159,59 +570,51 @@ def get_market_data(ticker, interval="1d", fetch_news=True):
                 news_summary.append("No se pudieron descargar noticias recientes.")
 
         # --- 4. EMPAQUETADO ---
-        close_price = last.get('Close', 0)
-        ema_200_val = last.get('EMA_200', 0)
-        
-        # Determine asset type for specialized analysis
-        from datetime import datetime
-        ticker_type = "CRYPTO" if "-USD" in ticker.upper() or "BTC" in ticker.upper() or "ETH" in ticker.upper() else "STOCK"
-        
-        llm_data = {
-            "analysis_date": datetime.now().strftime("%Y-%m-%d"),  # Critical: AI needs to know TODAY's date
-            "ticker_type": ticker_type,  # Stocks vs Crypto behave differently
-            "last_updated": str(hist.index[-1].date()),  # Date tracking
-            "price": round(close_price, 2),
-            "ema_20": round(last.get('EMA_20', 0), 2),
-            "ema_50": round(last.get('EMA_50', 0), 2),
-            "ema_200": round(ema_200_val, 2),
-            "rsi": round(last.get('RSI', 50), 2),
-            "macd": round(last.get('MACD', 0), 3),
-            "macd_signal": round(last.get('MACD_Signal', 0), 3),
-            "macd_hist": round(last.get('MACD_Hist', 0), 3),
-            "atr": round(last.get('ATR', 0), 2),
-            "adx": round(last.get('ADX', 0), 2),
-            "stoch_k": round(last.get('Stoch_K', 0), 2),
-            "stoch_d": round(last.get('Stoch_D', 0), 2),
-            "obv": round(last.get('OBV', 0), 2),
-            "sector": sector,
-            "trend": classify_trend(hist),
-            "fundamentals": fund_text,
-            "news": "\n".join(news_summary) if news_summary else "Sin noticias."
-        }
+        llm_data = _package_llm_data(ticker, hist, sector, fund_text, news_summary)
         
         return llm_data, hist, raw_news, None
         
     except Exception as e:
         return None, None, None, str(e)
 
-def get_multi_timeframe_data(ticker):
+def get_multi_timeframe_data(ticker, weekly_from_daily=True, daily_hist=None, compact=False):
     """
     Fetches both Weekly (The Judge) and Daily (The Sniper) data.
     Also fetches comprehensive news (Long Term + Short Term).
+    
+    With weekly_from_daily the weekly bars are resampled from the daily history
+    (see resample_to_weekly), so each ticker costs one history download instead of
+    two. Pass False to download Yahoo's native 1wk bars. Both weekly paths cover
+    WEEKLY_PERIOD (see its warm-up caveat). Either way stock.info is
+    read once (see get_fundamentals). `daily_hist` skips the daily download when the
+    history was already fetched in bulk (see get_bulk_histories). `compact` stores the
+    histories pruned and with float32 indicators (see compact_history), once the LLM
+    payloads have been built from the full-precision frames.
     """
     print(Fore.MAGENTA + f"   [Multi-TF] ⚖️ Obteniendo datos para estrategia Juez + Francotirador: {ticker}")
     
-    # 1. The Judge (Weekly)
-    # We don't need news from here, just technicals
-    wk_data, wk_hist, _, wk_error = get_market_data(ticker, interval="1wk", fetch_news=False)
-    if wk_error:
-        return None, wk_error
+    if weekly_from_daily:
+        # 1. The Sniper (Daily)
+        # We don't need news from here, we will fetch it separately to control the range
+        dy_data, dy_hist, _, dy_error = get_market_data(ticker, interval="1d", fetch_news=False, hist=daily_hist)
+        if dy_error:
+            return None, dy_error
         
-    # 2. The Sniper (Daily)
-    # We don't need news from here either, we will fetch it separately to control the range
-    dy_data, dy_hist, _, dy_error = get_market_data(ticker, interval="1d", fetch_news=False)
-    if dy_error:
-        return None, dy_error
+        # 2. The Judge (Weekly), derived locally from the daily bars
+        wk_hist = add_signal_columns(calculate_indicators(resample_to_weekly(dy_hist, period=WEEKLY_PERIOD)))
+        wk_data = _package_llm_data(ticker, wk_hist, dy_data['sector'], dy_data['fundamentals'], [])
+    else:
+        # 1. The Judge (Weekly)
+        # We don't need news from here, just technicals
+        wk_data, wk_hist, _, wk_error = get_market_data(ticker, interval="1wk", fetch_news=False)
+        if wk_error:
+            return None, wk_error
+            
+        # 2. The Sniper (Daily)
+        # We don't need news from here either, we will fetch it separately to control the range
+        dy_data, dy_hist, _, dy_error = get_market_data(ticker, interval="1d", fetch_news=False, hist=daily_hist)
+        if dy_error:
+            return None, dy_error
 
     # 3. Comprehensive News (90 Days for Earnings Cycle + Short Term)
     print(Fore.YELLOW + f"   [News] 📰 Buscando noticias extendidas de {ticker} (últimos 90 días - Earnings Cycle)...")
@@ -243,11 +646,68 @@ def get_multi_timeframe_data(ticker):
          
     # Add news summary to daily data for the agent to see
     dy_data['news'] = "\n".join(news_summary)
+    
+    if compact:
+        full_size = bundle_memory_report({"weekly_hist": wk_hist, "daily_hist": dy_hist})["total"]
+        wk_hist, dy_hist = compact_history(wk_hist), compact_history(dy_hist)
         
-    return {
+    bundle = {
         "weekly": wk_data,
         "daily": dy_data,
         "weekly_hist": wk_hist,
         "daily_hist": dy_hist,
         "news": raw_news # Raw list for UI
-    }, None
\ No newline at end of file
+    }
+    if compact:
+        size = bundle_memory_report(bundle)["total"]
+        print(Fore.CYAN + f"   [Data] 🧮 Historiales de {ticker}: {size / 1024:.0f} KB (compacto, antes {full_size / 1024:.0f} KB)")
+    return bundle, None
+
+def iter_market_data(tickers, fetch=None, max_workers=6, timeout=90):
+    """
+    Fetches multi-timeframe bundles for many tickers concurrently (at most `max_workers`
+    at once) and yields (ticker, bundle, error) as each one finishes, so the caller can
+    report progress immediately. `fetch` must return (bundle, error) like
+    get_multi_timeframe_data (the default). A ticker still running `timeout` seconds after
+    it started is yielded as a failure and abandoned; its slot goes to the next ticker
+    (the stalled thread keeps running apart), so it never blocks the rest.
+    """
+    fetch = fetch or get_multi_timeframe_data
+    tickers = list(dict.fromkeys(tickers))  # Sin duplicados, mismo orden
+    queue = iter(tickers)
+    
+    # One thread available per ticker: abandoned fetches keep theirs, and `pending` (not
+    # the pool size) caps how many run, so a ticker always starts the moment it's submitted
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(tickers)))
+    pending = {}  # future -> (ticker, started)
+    
+    def _submit_next():
+        for ticker in queue:
+            pending[executor.submit(fetch, ticker)] = (ticker, time.monotonic())
+            return
+    
+    try:
+        for _ in range(max_workers):
+            _submit_next()
+        while pending:
+            next_deadline = min(started for _, started in pending.values()) + timeout
+            wait = min(1.0, max(0.0, next_deadline - time.monotonic()))
+            done, _ = concurrent.futures.wait(pending, timeout=wait, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                ticker, _ = pending.pop(future)
+                _submit_next()
+                try:
+                    bundle, error = future.result()
+                except Exception as e:
+                    bundle, error = None, str(e)
+                yield ticker, bundle, error
+            
+            now = time.monotonic()
+            for future, (ticker, started) in list(pending.items()):
+                if now - started > timeout:
+                    del pending[future]
+                    _submit_next()
+                    yield ticker, None, f"Timeout: sin respuesta tras {timeout}s"
+    finally:
+        # Abandoned (timed out) downloads keep running in background; nothing waits on them
+        executor.shutdown(wait=False, cancel_futures=True)
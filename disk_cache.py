@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from colorama import Fore, init
+
+init(autoreset=True)
+
+# Directorio de caché persistente (sobrevive reinicios de Streamlit; montado en docker-compose)
+CACHE_DIR = os.getenv("FINANCE_AGENT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+class DiskCache:
+    """
+    Small persistent key/value store (SQLite) with TTL and size-based LRU eviction.
+    Values must be JSON-serializable. One instance can be shared between threads.
+    Storage errors are logged and treated as cache misses, never raised.
+    """
+    def __init__(self, name, ttl, max_bytes=50 * 1024 * 1024, path=None):
+        self.path = path or os.path.join(CACHE_DIR, f"{name}.sqlite3")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @staticmethod
+    def make_key(*parts):
+        """Content-addressed key: SHA-256 of the canonical JSON of `parts`"""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key, default=None):
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return default
+
+                now = time.time()
+                if now - row[1] > self.ttl:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    conn.commit()
+                    return default
+
+                conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                conn.commit()
+                return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            print(Fore.YELLOW + f"   [Cache] ⚠️ Error leyendo {os.path.basename(self.path)}: {e}")
+            return default
+
+    def set(self, key, value):
+        try:
+            payload = json.dumps(value, ensure_ascii=False, default=str)
+            now = time.time()
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, payload, len(payload.encode("utf-8")), now, now)
+                )
+                self._evict(conn, now)
+                conn.commit()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(Fore.YELLOW + f"   [Cache] ⚠️ Error guardando en {os.path.basename(self.path)}: {e}")
+
+    def _evict(self, conn, now):
+        """Drops expired entries, then least recently used ones until under max_bytes"""
+        conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC"):
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def clear(self):
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute("DELETE FROM entries")
+                conn.commit()
+        except sqlite3.Error as e:
+            print(Fore.YELLOW + f"   [Cache] ⚠️ Error limpiando {os.path.basename(self.path)}: {e}")
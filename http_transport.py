@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TIMEOUT = (3.05, 10)  # (connect, read) en segundos
+DEFAULT_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class HttpTransport:
+    """
+    Shared HTTP layer for the news agents.
+
+    - One keep-alive connection pool (no TLS handshake per request).
+    - At most `per_host_limit` concurrent requests per host.
+    - Default timeouts on every request.
+    - Up to `max_retries` retries on connection errors, timeouts, 429 and 5xx, with
+      exponential backoff plus jitter (Retry-After is honoured).
+    - Conditional GETs for fetch(conditional=True): ETag / Last-Modified are sent back
+      and a 304 returns the body kept from the previous download.
+    """
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_retries=2, per_host_limit=4, pool_maxsize=32,
+                 backoff=0.5, backoff_max=8.0, max_cached_bodies=256):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.per_host_limit = per_host_limit
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.max_cached_bodies = max_cached_bodies
+
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self._validators = OrderedDict()  # url -> (etag, last_modified, body)
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                try:
+                    return min(max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()), self.backoff_max)
+                except (TypeError, ValueError):
+                    pass
+        return min(self.backoff_max, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def get(self, url, headers=None, timeout=None, **kwargs):
+        """GET with pooling, per-host limit, timeout and retries. Returns the last response."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._host_slot(url):
+                    response = self.session.get(url, headers=headers, timeout=timeout or self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                delay = self._retry_delay(attempt, response)
+                response.close()  # Return the connection to the pool
+                time.sleep(delay)
+                continue
+            return response
+
+    def fetch(self, url, headers=None, timeout=None, conditional=False):
+        """Body of a successful GET as bytes (raises for HTTP errors)"""
+        headers = dict(headers or {})
+        cached = None
+        if conditional:
+            with self._lock:
+                cached = self._validators.get(url)
+            if cached:
+                etag, last_modified, _ = cached
+                if etag:
+                    headers['If-None-Match'] = etag
+                if last_modified:
+                    headers['If-Modified-Since'] = last_modified
+
+        response = self.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached:
+            return cached[2]
+        response.raise_for_status()
+
+        if conditional:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if etag or last_modified:
+                with self._lock:
+                    self._validators[url] = (etag, last_modified, response.content)
+                    self._validators.move_to_end(url)
+                    while len(self._validators) > self.max_cached_bodies:
+                        self._validators.popitem(last=False)
+        return response.content
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+def default_transport():
+    """Process-wide transport shared by every agent that isn't given its own"""
+    global _default_transport
+    with _default_lock:
+        if _default_transport is None:
+            _default_transport = HttpTransport()
+        return _default_transport
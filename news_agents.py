@@ -1,13 +1,81 @@
 import feedparser
 import yfinance as yf
 import urllib.parse
-import requests
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from zoneinfo import ZoneInfo
 import concurrent.futures
+import asyncio
+import math
+import os
+import re
+import string
+import time
+import threading
+import zlib
 from abc import ABC, abstractmethod
+import numpy as np
+from disk_cache import DiskCache
+from http_transport import default_transport
+
+class SharedFeedCache:
+    """
+    Process-wide cache for ticker-independent feeds (same URL for every ticker).
+    TTL-bounded and single-flight: concurrent callers asking for the same key while it
+    is downloading wait for that one download instead of starting their own.
+    """
+    def __init__(self, ttl=10 * 60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}   # key -> (expires_at, value)
+        self._inflight = {}  # key -> Future of the running download
+    
+    def get(self, key, loader, should_cache=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+            future = self._inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+        
+        if not is_owner:
+            return future.result()
+        
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        
+        with self._lock:
+            # A failed/empty download is handed to the waiters but not kept
+            if should_cache is None or should_cache(value):
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+            del self._inflight[key]
+        future.set_result(value)
+        return value
+
+# Feeds genéricos compartidos entre tickers (y entre sesiones de Streamlit del proceso)
+shared_feeds = SharedFeedCache(ttl=10 * 60)
 
 class NewsAgent(ABC):
+    # Nombre de la fuente (clave en NewsStore) y ventana de frescura de su caché en segundos
+    name = "News"
+    cache_ttl = 15 * 60
+    
+    def __init__(self, transport=None):
+        # Shared pooled HTTP layer (timeouts, retries, conditional GETs)
+        self.transport = transport or default_transport()
+    
+    def _fetch_feed(self, url):
+        """Downloads an RSS/Atom feed through the transport and parses the raw XML"""
+        return feedparser.parse(self.transport.fetch(url, conditional=True))
+    
     @abstractmethod
     def get_news(self, ticker: str, days: int = 7) -> list[dict]:
         """
@@ -38,26 +106,123 @@ class NewsAgent(ABC):
         Aggressive title cleaning for better deduplication.
         Removes common words, punctuation, normalizes whitespace.
         """
-        import re
-        import string
-        
-        # Lowercase
-        title = title.lower()
-        
-        # Remove common noise words that differ between sources
-        noise_words = ['stock', 'news', 'breaking', 'update', 'alert', 'report', 
-                       'analysis', 'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at']
-        words = title.split()
-        words = [w for w in words if w not in noise_words]
-        
-        # Join and remove all punctuation and whitespace
-        clean = ''.join(words)
-        clean = clean.translate(str.maketrans('', '', string.punctuation))
-        clean = re.sub(r'\s+', '', clean)
-        
-        return clean
+        # Lowercase, drop noise words, then remove all punctuation and whitespace
+        words = [w for w in title.lower().split() if w not in _NOISE_WORDS]
+        return ''.join(words).translate(_PUNCTUATION_TABLE)
+
+# Palabras que varían entre fuentes para el mismo titular (precompiladas una sola vez)
+_NOISE_WORDS = frozenset(['stock', 'news', 'breaking', 'update', 'alert', 'report',
+                          'analysis', 'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at'])
+_PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+# Sufijo de medio que añade Google News: "Titular - Reuters". Solo se quita si es el medio
+# del propio item o uno conocido: "Resultados - los ingresos superan" es parte del titular
+_SOURCE_SUFFIX_RE = re.compile(r'\s+[-–—|]\s+([^-–—|]{2,40})$')
+_KNOWN_PUBLISHERS = frozenset(['reuters', 'bloomberg', 'cnbc', 'yahoo finance', 'yahoo', 'marketwatch',
+                               'the wall street journal', 'wsj', 'financial times', 'ft', 'barron\'s',
+                               'forbes', 'business insider', 'investing.com', 'seeking alpha', 'the motley fool',
+                               'motley fool', 'benzinga', 'zacks', 'zacks investment research', 'finviz',
+                               'associated press', 'ap news', 'cnn', 'cnn business', 'fox business',
+                               'investor\'s business daily', 'thestreet', 'nasdaq', 'morningstar', 'axios'])
+# Verbos/adjetivos de dirección: dos titulares casi iguales que solo difieren en "rise"/"fall" dicen lo contrario
+_UP_WORDS = frozenset(['rise', 'rises', 'rising', 'rose', 'jump', 'jumps', 'jumped', 'surge', 'surges', 'surged',
+                       'soar', 'soars', 'soared', 'gain', 'gains', 'gained', 'climb', 'climbs', 'climbed',
+                       'rally', 'rallies', 'rallied', 'beat', 'beats', 'raise', 'raises', 'raised', 'hike',
+                       'hikes', 'hiked', 'up', 'higher', 'high', 'upgrade', 'upgrades', 'upgraded', 'buy',
+                       'bullish', 'sube', 'suben', 'alza', 'gana', 'ganan'])
+_DOWN_WORDS = frozenset(['fall', 'falls', 'falling', 'fell', 'drop', 'drops', 'dropped', 'plunge', 'plunges',
+                         'plunged', 'sink', 'sinks', 'sank', 'slide', 'slides', 'slid', 'slump', 'slumps',
+                         'slumped', 'tumble', 'tumbles', 'tumbled', 'decline', 'declines', 'declined', 'lose',
+                         'loses', 'lost', 'miss', 'misses', 'missed', 'cut', 'cuts', 'lower', 'lowers',
+                         'lowered', 'down', 'low', 'downgrade', 'downgrades', 'downgraded', 'sell', 'bearish',
+                         'baja', 'bajan', 'cae', 'caen', 'pierde', 'pierden'])
+
+class TitleDeduplicator:
+    """
+    Near-duplicate headline detection across sources.
+
+    Titles are normalized (publisher suffix when it names the item's source or a known
+    publisher, case, punctuation, noise words) and split
+    into character shingles. A MinHash signature per title is bucketed with LSH bands,
+    so each title is only compared against the few earlier titles sharing a bucket;
+    candidates are confirmed with the exact Jaccard similarity of their shingles and a
+    word-level check: titles whose differing words point in opposite directions
+    ("rise" vs "fall", "raise" vs "cut") are kept apart however similar they look.
+    Roughly linear in the number of items. Stateless between calls (thread-safe).
+    """
+    _PRIME = (1 << 31) - 1
+
+    def __init__(self, threshold=0.7, shingle_size=5, num_perm=64, bands=16, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, self._PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, self._PRIME, num_perm, dtype=np.uint64)
+
+    @staticmethod
+    def normalize(title: str, source: str = None) -> str:
+        suffix = _SOURCE_SUFFIX_RE.search(title)
+        if suffix:
+            publisher = suffix.group(1).strip().lower()
+            if publisher in _KNOWN_PUBLISHERS or (source and publisher == source.strip().lower()):
+                title = title[:suffix.start()]
+        title = title.lower().translate(_PUNCTUATION_TABLE)
+        return ' '.join(w for w in title.split() if w not in _NOISE_WORDS)
+
+    def shingles(self, normalized: str) -> frozenset:
+        k = self.shingle_size
+        return frozenset(normalized[i:i + k] for i in range(max(1, len(normalized) - k + 1)))
+
+    def signature(self, shingles: frozenset) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+        hashes %= self._PRIME
+        # Products stay below 2**62: no uint64 overflow
+        return ((hashes[:, None] * self._a + self._b) % self._PRIME).min(axis=0)
+
+    @staticmethod
+    def opposite_direction(words: frozenset, other: frozenset) -> bool:
+        """True if the words only one title has say up where the other's say down"""
+        only_here, only_there = words - other, other - words
+        return bool((only_here & _UP_WORDS and only_there & _DOWN_WORDS) or
+                    (only_here & _DOWN_WORDS and only_there & _UP_WORDS))
+
+    def deduplicate(self, items: list[dict]) -> list[dict]:
+        """Keeps the first item of every group of near-identical titles, in input order"""
+        kept, kept_shingles, kept_words = [], [], []
+        exact = {}    # normalized title -> kept index
+        buckets = {}  # (band, band signature) -> kept indices
+        for item in items:
+            normalized = self.normalize(item.get('title', ''), item.get('source'))
+            if normalized in exact:
+                continue
+
+            shingles = self.shingles(normalized)
+            signature = self.signature(shingles)
+            band_keys = [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+            candidates = {index for key in band_keys for index in buckets.get(key, ())}
+            words = frozenset(normalized.split())
+            if any(len(shingles & kept_shingles[i]) / len(shingles | kept_shingles[i]) >= self.threshold
+                   and not self.opposite_direction(words, kept_words[i]) for i in candidates):
+                continue
+
+            index = len(kept)
+            kept.append(item)
+            kept_shingles.append(shingles)
+            kept_words.append(words)
+            exact[normalized] = index
+            for key in band_keys:
+                buckets.setdefault(key, []).append(index)
+        return kept
+
+title_deduplicator = TitleDeduplicator()
 
 class GoogleNewsAgent(NewsAgent):
+    name = "Google News"
+    cache_ttl = 15 * 60
+    
     def get_news(self, ticker: str, days: int = 7) -> list[dict]:
         """
         Obtiene noticias de los últimos 'days' días.
@@ -72,11 +237,22 @@ class GoogleNewsAgent(NewsAgent):
         ]
         
         try:
-            for query_text in queries:
-                # when:Xd syntax for Google News
-                encoded_query = urllib.parse.quote(f"{query_text} when:{days}d")
-                rss_url = f"https://news.google.com/rss/search?q={encoded_query}&hl=en-US&gl=US&ceid=US:en"
-                feed = feedparser.parse(rss_url)
+            # when:Xd syntax for Google News
+            rss_urls = [
+                f"https://news.google.com/rss/search?q={urllib.parse.quote(f'{query_text} when:{days}d')}&hl=en-US&gl=US&ceid=US:en"
+                for query_text in queries
+            ]
+            
+            # Las consultas van en paralelo sobre la sesión compartida; se parsean al terminar
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(rss_urls)) as executor:
+                futures = [executor.submit(self._fetch_feed, rss_url) for rss_url in rss_urls]
+            
+            for query_text, future in zip(queries, futures):
+                try:
+                    feed = future.result()
+                except Exception as e:
+                    print(f"Error in GoogleNewsAgent ({query_text}): {e}")
+                    continue
                 
                 # Aumentamos límite a 10 por query
                 for entry in feed.entries[:10]:
@@ -107,11 +283,15 @@ class GoogleNewsAgent(NewsAgent):
         return news_items
 
 class YahooNewsAgent(NewsAgent):
+    name = "Yahoo Finance"
+    cache_ttl = 10 * 60
+    
     def get_news(self, ticker: str, days: int = 7) -> list[dict]:
         news_items = []
         cutoff_date = datetime.now() - timedelta(days=days)
         
         try:
+            # yfinance needs its own (curl_cffi) session, so this agent doesn't use self.transport
             stock = yf.Ticker(ticker)
             news_data = stock.news
             
@@ -141,49 +321,149 @@ class YahooNewsAgent(NewsAgent):
             print(f"Error in YahooNewsAgent: {e}")
         return news_items
 
+class _FinVizNewsTableParser(HTMLParser):
+    """
+    Incremental parser for the rows of FinViz's #news-table. Ignores the rest of the
+    page and sets `done` once the table closes (or `max_rows` rows were read), so the
+    caller can stop downloading. Rows are (date cell text, title, href).
+    """
+    def __init__(self, max_rows=None):
+        super().__init__()
+        self.max_rows = max_rows
+        self.rows = []
+        self.done = False
+        self._table_depth = 0
+        self._row = None
+        self._in_date_cell = False
+        self._in_link = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == 'table':
+            if self._table_depth or dict(attrs).get('id') == 'news-table':
+                self._table_depth += 1
+        elif not self._table_depth:
+            return
+        elif tag == 'tr':
+            self._row = {'date': [], 'title': [], 'link': None, 'cells': 0}
+        elif tag == 'td' and self._row is not None:
+            self._row['cells'] += 1
+            self._in_date_cell = self._row['cells'] == 1
+        elif tag == 'a' and self._row is not None and self._row['link'] is None:
+            self._row['link'] = dict(attrs).get('href')
+            self._in_link = True
+
+    def handle_endtag(self, tag):
+        if not self._table_depth or self.done:
+            return
+        if tag == 'td':
+            self._in_date_cell = False
+        elif tag == 'a':
+            self._in_link = False
+        elif tag == 'tr' and self._row is not None:
+            if self._row['link']:
+                self.rows.append((''.join(self._row['date']).strip(), ''.join(self._row['title']).strip(), self._row['link']))
+            self._row = None
+            if self.max_rows and len(self.rows) >= self.max_rows:
+                self.done = True
+        elif tag == 'table':
+            self._table_depth -= 1
+            self.done = self._table_depth == 0
+
+    def handle_data(self, data):
+        if self._row is None or self.done:
+            return
+        if self._in_link:
+            self._row['title'].append(data)
+        elif self._in_date_cell:
+            self._row['date'].append(data)
+
 class FinVizNewsAgent(NewsAgent):
+    name = "FinViz"
+    cache_ttl = 10 * 60
+    # FinViz publica las horas en horario de Nueva York
+    timezone = ZoneInfo("America/New_York")
+    
+    @classmethod
+    def _parse_date_cell(cls, text: str, current_day, now: datetime):
+        """
+        FinViz date cells: "Oct-17-26 09:30AM" or "Today 09:30AM" open a new day, and the
+        following rows of that day only carry "08:15AM". Returns (aware datetime, day).
+        """
+        parts = text.split()
+        if not parts:
+            return None, current_day
+        if len(parts) >= 2:
+            if parts[0].lower() == 'today':
+                current_day = now.date()
+            else:
+                current_day = datetime.strptime(parts[0], '%b-%d-%y').date()
+        if current_day is None:
+            return None, current_day
+        clock = datetime.strptime(parts[-1], '%I:%M%p').time()
+        return datetime.combine(current_day, clock, tzinfo=cls.timezone), current_day
+    
+    @staticmethod
+    def _parse_rows(html_chunks, max_rows=15):
+        """Feeds the page to the news-table parser until the table is complete"""
+        parser = _FinVizNewsTableParser(max_rows=max_rows)
+        for chunk in html_chunks:
+            parser.feed(chunk)
+            if parser.done:
+                break
+        return parser.rows
+    
     def get_news(self, ticker: str, days: int = 7) -> list[dict]:
         news_items = []
-        # FinViz doesn't support easy date filtering in URL, so we parse and filter if possible
-        # For simplicity in scraping, we just take the top items and assume they are recent.
         try:
             url = f"https://finviz.com/quote.ashx?t={ticker}"
             headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-            response = requests.get(url, headers=headers, timeout=5)
-            soup = BeautifulSoup(response.content, 'html.parser')
+            # Streamed: the news table sits mid-page, the rest is never downloaded or parsed
+            response = self.transport.get(url, headers=headers, timeout=5, stream=True)
+            try:
+                if response.encoding is None:
+                    response.encoding = 'utf-8'
+                rows = self._parse_rows(response.iter_content(chunk_size=16 * 1024, decode_unicode=True))
+            finally:
+                response.close()
             
-            news_table = soup.find(id='news-table')
-            if news_table:
-                rows = news_table.findAll('tr')
-                for row in rows[:15]: # Check top 15
-                    a_tag = row.find('a')
-                    if not a_tag: continue
-                    
-                    link = a_tag['href']
-                    title = a_tag.text
-                    td_text = row.td.text.strip()
-                    
-                    # Very basic date parsing could go here, but for now we trust FinViz sorts by date
-                    # We'll just take them as "Recent"
-                    
-                    news_items.append({
-                        "source": "FinViz",
-                        "title": title,
-                        "link": link,
-                        "published": td_text, 
-                        "timestamp": datetime.now().timestamp(),
-                        "description": ""  # FinViz scraping doesn't provide easy description access
-                    })
+            now = datetime.now(self.timezone)
+            cutoff_date = now - timedelta(days=days)
+            current_day = None
+            for date_text, title, href in rows:
+                try:
+                    dt, current_day = self._parse_date_cell(date_text, current_day, now)
+                except ValueError:
+                    dt = None
+                if dt is None:
+                    continue
+                if dt < cutoff_date:
+                    break  # FinViz lists newest first
+                
+                local_dt = datetime.fromtimestamp(dt.timestamp())
+                news_items.append({
+                    "source": "FinViz",
+                    "title": title,
+                    "link": urllib.parse.urljoin(url, href),
+                    "published": local_dt.strftime('%Y-%m-%d %H:%M'),
+                    "timestamp": dt.timestamp(),
+                    "description": ""  # FinViz scraping doesn't provide easy description access
+                })
         except Exception as e:
             print(f"Error in FinVizNewsAgent: {e}")
         return news_items
 
 class InvestingComAgent(NewsAgent):
+    name = "Investing.com"
+    cache_ttl = 30 * 60
+    
     def get_news(self, ticker: str, days: int = 7) -> list[dict]:
         news_items = []
         try:
             rss_url = "https://www.investing.com/rss/news_25.rss" 
-            feed = feedparser.parse(rss_url)
+            # Same feed for every ticker: one download per TTL for the whole process
+            feed = shared_feeds.get(rss_url, lambda: self._fetch_feed(rss_url), should_cache=lambda f: bool(f.entries))
             
             cutoff_date = datetime.now() - timedelta(days=days)
 
@@ -208,39 +488,209 @@ class InvestingComAgent(NewsAgent):
             print(f"Error in InvestingComAgent: {e}")
         return news_items
 
+# Tiempo máximo (s) que get_consolidated_news espera a las fuentes antes de devolver lo que haya
+NEWS_DEADLINE = float(os.getenv("NEWS_DEADLINE", "10"))
+
+class NewsStore:
+    """
+    Persistent news cache keyed by ticker + source (SQLite, see DiskCache).
+    Each entry keeps the items by link/title slug, when the source was last fetched
+    and the oldest date that fetch history covers.
+    """
+    RETENTION = 120 * 24 * 3600  # Items older than this are dropped
+    
+    def __init__(self, path=None):
+        self.cache = DiskCache("news", ttl=self.RETENTION, max_bytes=100 * 1024 * 1024, path=path)
+    
+    @staticmethod
+    def _key(ticker, source):
+        return f"{source}:{ticker.upper()}"
+    
+    @staticmethod
+    def slug(item):
+        return item.get('link') or NewsAgent._clean_title(item.get('title', ''))
+    
+    def load(self, ticker, source):
+        return self.cache.get(self._key(ticker, source))
+    
+    def save(self, ticker, source, entry):
+        cutoff = time.time() - self.RETENTION
+        entry['items'] = {k: v for k, v in entry['items'].items() if v.get('timestamp', 0) >= cutoff}
+        self.cache.set(self._key(ticker, source), entry)
+
+_default_store = None
+
+def _get_default_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = NewsStore()
+    return _default_store
+
 class NewsAggregator:
-    def __init__(self):
+    def __init__(self, use_cache=True, store=None, transport=None):
         self.agents = [
-            GoogleNewsAgent(),
-            YahooNewsAgent(),
-            FinVizNewsAgent(),
-            InvestingComAgent()
+            GoogleNewsAgent(transport),
+            YahooNewsAgent(transport),
+            FinVizNewsAgent(transport),
+            InvestingComAgent(transport)
         ]
+        self.store = (store or _get_default_store()) if use_cache else None
+    
+    def _fetch_agent(self, agent, ticker, days):
+        """
+        agent.get_news() through the NewsStore: within the source's cache_ttl the stored
+        items are returned without network; after it only the days since the last fetch
+        are requested and merged into the stored items.
+        """
+        if self.store is None:
+            return agent.get_news(ticker, days)
+        
+        now = time.time()
+        cutoff = now - days * 86400
+        entry = self.store.load(ticker, agent.name)
+        
+        if entry and entry['covered_since'] <= cutoff:
+            age = now - entry['fetched_at']
+            if age < agent.cache_ttl:
+                return [n for n in entry['items'].values() if n.get('timestamp', 0) >= cutoff]
+            # Solo el hueco desde la última descarga
+            fetch_days = min(days, max(1, math.ceil(age / 86400)))
+            covered_since = entry['covered_since']
+        else:
+            fetch_days = days
+            covered_since = min(entry['covered_since'], cutoff) if entry else cutoff
+        
+        fresh = agent.get_news(ticker, fetch_days)
+        items = dict(entry['items']) if entry else {}
+        for item in fresh:
+            items[NewsStore.slug(item)] = item
+        
+        # Agents swallow their errors and return [], so an empty fetch may be a failure:
+        # fetched_at only moves forward when the source answered, and it is retried next time
+        if fresh:
+            self.store.save(ticker, agent.name, {'fetched_at': now, 'covered_since': covered_since, 'items': items})
+        return [n for n in items.values() if n.get('timestamp', 0) >= cutoff]
+    
+    def _timed_fetch(self, agent, ticker, days):
+        start = time.monotonic()
+        items = self._fetch_agent(agent, ticker, days)
+        return items, time.monotonic() - start
     
-    def get_consolidated_news(self, ticker: str, days: int = 7) -> list[dict]:
+    def get_consolidated_news(self, ticker: str, days: int = 7, deadline: float = None, with_metadata: bool = False):
+        """
+        Consolidated, de-duplicated news from every source, newest first.
+        Waits at most `deadline` seconds overall (default NEWS_DEADLINE): sources still
+        running then are dropped and the partial result is returned. With
+        with_metadata=True returns (news, metadata) including per-source status
+        ('ok' / 'empty' / 'error' / 'timeout'), item count and elapsed seconds.
+        """
+        deadline = NEWS_DEADLINE if deadline is None else deadline
+        start = time.monotonic()
         all_news = []
+        sources = {}
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            future_to_agent = {executor.submit(agent.get_news, ticker, days): agent for agent in self.agents}
-            for future in concurrent.futures.as_completed(future_to_agent):
-                try:
-                    data = future.result()
-                    if data:
-                        all_news.extend(data)
-                except Exception as exc:
-                    print(f"Agent generated an exception: {exc}")
-        
-        # Deduplicate by Title with aggressive cleaning
-        seen_titles = set()
-        unique_news = []
-        for item in all_news:
-            title_slug = NewsAgent._clean_title(item['title'])
-            if title_slug not in seen_titles:
-                seen_titles.add(title_slug)
-                unique_news.append(item)
+        # Not a `with` block: its exit would wait for the sources that missed the deadline
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(self.agents))
+        try:
+            future_to_agent = {executor.submit(self._timed_fetch, agent, ticker, days): agent for agent in self.agents}
+            try:
+                for future in concurrent.futures.as_completed(future_to_agent, timeout=deadline):
+                    agent = future_to_agent[future]
+                    try:
+                        data, elapsed = future.result()
+                        sources[agent.name] = {"status": "ok" if data else "empty", "items": len(data or []), "elapsed": round(elapsed, 3)}
+                        if data:
+                            all_news.extend(data)
+                    except Exception as exc:
+                        print(f"Agent generated an exception: {exc}")
+                        sources[agent.name] = {"status": "error", "error": str(exc), "items": 0, "elapsed": round(time.monotonic() - start, 3)}
+            except concurrent.futures.TimeoutError:
+                for agent in future_to_agent.values():
+                    if agent.name not in sources:
+                        print(f"⏱️ {agent.name} superó el deadline de {deadline}s para {ticker}, se descarta.")
+                        sources[agent.name] = {"status": "timeout", "items": 0, "elapsed": round(time.monotonic() - start, 3)}
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        news = self._consolidate(all_news)
+        if with_metadata:
+            return news, {"ticker": ticker, "deadline": deadline, "elapsed": round(time.monotonic() - start, 3), "sources": sources}
+        return news
+    
+    @staticmethod
+    def _consolidate(all_news: list[dict]) -> list[dict]:
+        # Deduplicate near-identical titles (syndicated headlines across sources)
+        unique_news = title_deduplicator.deduplicate(all_news)
         
         # Sort by timestamp descending
         unique_news.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
         
         return unique_news[:30] # Increased limit
-
+    
+    # --- MODO ASYNC: muchos tickers x fuentes en un solo event loop ---
+    
+    async def aget_consolidated_news(self, ticker: str, days: int = 7, semaphore=None, executor=None, deadline: float = None) -> list[dict]:
+        """
+        Async version of get_consolidated_news (same deadline, no metadata). The agents
+        are blocking, so each (ticker, source) call runs on `executor`; `semaphore` caps
+        how many run at once across every ticker sharing it.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = semaphore or asyncio.Semaphore(len(self.agents))
+        
+        deadline = NEWS_DEADLINE if deadline is None else deadline
+        
+        def release(future):
+            # The slot is freed when the thread finishes, not when the deadline drops it:
+            # abandoned sources keep their executor worker, so they must keep their slot too
+            semaphore.release()
+            if not future.cancelled():
+                future.exception()  # Retrieved so a late failure isn't logged as unhandled
+        
+        # The deadline counts from when the source starts (a slot and a free worker), not while it waits
+        async def run(agent):
+            await semaphore.acquire()
+            try:
+                future = loop.run_in_executor(executor, self._fetch_agent, agent, ticker, days)
+            except BaseException:
+                semaphore.release()
+                raise
+            future.add_done_callback(release)
+            return await asyncio.wait_for(asyncio.shield(future), timeout=deadline)
+        
+        all_news = []
+        results = await asyncio.gather(*(run(agent) for agent in self.agents), return_exceptions=True)
+        for agent, result in zip(self.agents, results):
+            if isinstance(result, asyncio.TimeoutError):
+                print(f"⏱️ {agent.name} superó el deadline de {deadline}s para {ticker}, se descarta.")
+            elif isinstance(result, Exception):
+                print(f"Agent generated an exception: {result}")
+            elif result:
+                all_news.extend(result)
+        return self._consolidate(all_news)
+    
+    async def aiter_news_for_tickers(self, tickers: list[str], days: int = 7, max_concurrency: int = 16, deadline: float = None):
+        """
+        Fetches news for a whole portfolio on one event loop and yields
+        (ticker, news) as each ticker completes. At most `max_concurrency`
+        source requests are in flight across all tickers.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency)
+        try:
+            async def one(ticker):
+                return ticker, await self.aget_consolidated_news(ticker, days, semaphore, executor, deadline)
+            
+            for next_done in asyncio.as_completed([one(t) for t in dict.fromkeys(tickers)]):
+                yield await next_done
+        finally:
+            # Sources dropped by the deadline may still be running; nothing waits on them
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def get_news_for_tickers(self, tickers: list[str], days: int = 7, max_concurrency: int = 16, deadline: float = None) -> dict[str, list[dict]]:
+        """Blocking wrapper around aiter_news_for_tickers: {ticker: news} in input order"""
+        async def collect():
+            return {ticker: news async for ticker, news in self.aiter_news_for_tickers(tickers, days, max_concurrency, deadline)}
+        
+        results = asyncio.run(collect())
+        return {t: results[t] for t in dict.fromkeys(tickers)}
@@ -0,0 +1,137 @@
+import math
+import re
+from datetime import datetime
+from functools import lru_cache
+
+import tiktoken
+from colorama import Fore
+
+# Presupuestos de tokens por sección de prompt
+CATALYST_NEWS_TOKENS = 700     # Noticias de los últimos 5 días (analista)
+CONTEXT_NEWS_TOKENS = 900      # Noticias de contexto de 90 días (analista)
+CIO_REPORTS_TOKENS = 6000      # Todos los veredictos juntos (CIO)
+MIN_VERDICT_TOKENS = 60        # Mínimo por activo aunque la cartera sea muy grande
+
+# Estimación offline: dígitos de 3 en 3 y letras de 3 en 3 (o200k parte así o más largo),
+# saltos de línea con su sangría y cada símbolo por separado (los no ASCII pesan más)
+_TOKEN_RE = re.compile(r"\d{1,3}|[^\W\d_]{1,3}|\s*\n\s*|[^\s\d\w]|_")
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """o200k_base (GPT-4o / GPT-5 family), or None if its vocabulary can't be loaded (offline)"""
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(Fore.YELLOW + f"   [Prompt] ⚠️ Vocabulario de tiktoken no disponible, se estiman los tokens: {e}")
+        return None
+
+def estimate_tokens(text: str) -> int:
+    """Offline token estimate, meant never to undercount o200k_base"""
+    return sum(max(1, len(piece.encode('utf-8')) - 1) if len(piece) == 1 and not piece.isascii() else 1
+               for piece in _TOKEN_RE.findall(text))
+
+def count_tokens(text: str) -> int:
+    """Tokens of `text` for the OpenAI models (tiktoken; estimate_tokens only if offline)"""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text))
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """`text` cut at a word boundary so it fits in `budget` tokens (with an ellipsis)"""
+    if count_tokens(text) <= budget:
+        return text
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:  # Longest prefix of words that fits, by bisection
+        mid = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:mid]) + " …") <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return " ".join(words[:low]) + " …"
+
+def fit_lines(lines: list[str], budget: int) -> tuple[list[str], int]:
+    """Keeps lines in order while they fit in `budget` tokens. Returns (kept, dropped count)"""
+    kept, used = [], 0
+    for line in lines:
+        cost = count_tokens(line) + 1  # + newline
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return kept, len(lines) - len(kept)
+
+def rank_news(news: list[dict], ticker: str, now: datetime = None, half_life_days: float = 7.0) -> list[dict]:
+    """
+    News ordered by recency (exponential decay with `half_life_days`) plus relevance:
+    items that name the ticker in the title (or the description) rank higher.
+    """
+    now = now or datetime.now()
+    pattern = re.compile(rf"\b{re.escape(ticker.split('-')[0])}\b", re.IGNORECASE)
+
+    def score(item):
+        timestamp = item.get('timestamp')
+        if timestamp:
+            age_days = max(0.0, (now.timestamp() - float(timestamp)) / 86400)
+        else:
+            try:
+                age_days = max(0.0, (now - datetime.strptime(item.get('published', '')[:10], "%Y-%m-%d")).days)
+            except ValueError:
+                age_days = half_life_days * 2
+        recency = math.pow(0.5, age_days / half_life_days)
+        relevance = 1.0 if pattern.search(item.get('title', '')) else 0.5 if pattern.search(item.get('description', '') or '') else 0.0
+        return recency + relevance
+
+    return sorted(news, key=score, reverse=True)
+
+def build_news_section(news: list[dict], ticker: str, header: str, empty_text: str, budget: int, max_items: int = None) -> str:
+    """Ranked news lines under `header`, as many as fit in `budget` tokens"""
+    if not news:
+        return empty_text
+    ranked = rank_news(news, ticker)[:max_items]
+    lines = [f"- [{n.get('published')}] {n.get('title')} ({n.get('source')})" for n in ranked]
+    kept, dropped = fit_lines(lines, budget - count_tokens(header) - 20)
+    if dropped:
+        kept.append(f"(+{dropped} noticias menos relevantes omitidas)")
+    return header + "\n" + "\n".join(kept) + "\n"
+
+_VERDICT_FIELDS = {
+    "action": re.compile(r"\*\*Action\*\*\s*:\s*(.+)"),
+    "timing": re.compile(r"\*\*Timing Instruction\*\*\s*:\s*(.+)"),
+    "rationale": re.compile(r"\*\*Rationale\*\*\s*:\s*(.+)"),
+    "weekly": re.compile(r"\*\*Weekly \(Macro\)\*\*\s*:\s*(.+)"),
+    "daily": re.compile(r"\*\*Daily \(Timing\)\*\*\s*:\s*(.+)"),
+}
+
+def compress_report(ticker: str, report: str, daily: dict = None, budget: int = 250) -> str:
+    """
+    Structured verdict of an analyst report for the CIO: action, timing, rationale and
+    the one-line weekly/daily diagnosis, plus price/trend/RSI from the data. Falls back
+    to the truncated report when it doesn't follow the analyst format.
+    """
+    fields = {name: pattern.search(report or "") for name, pattern in _VERDICT_FIELDS.items()}
+    fields = {name: match.group(1).strip() for name, match in fields.items() if match}
+    daily = daily or {}
+    snapshot = f"Precio ${daily.get('price')} | Tendencia: {daily.get('trend')} | RSI: {daily.get('rsi')}" if daily else ""
+
+    if "action" not in fields:
+        return truncate_to_tokens(f"**{ticker}** {snapshot}\n{report}", budget)
+
+    lines = [f"**{ticker}** → {fields['action']}" + (f" | {snapshot}" if snapshot else "")]
+    for label, name in (("Timing", "timing"), ("Motivo", "rationale"), ("Semanal", "weekly"), ("Diario", "daily")):
+        if name in fields:
+            lines.append(f"  - {label}: {fields[name]}")
+    return truncate_to_tokens("\n".join(lines), budget)
+
+def build_cio_reports(reports: list[tuple[str, str, dict]], budget: int = CIO_REPORTS_TOKENS) -> str:
+    """
+    Compressed verdicts of every (ticker, report, daily data) within `budget` tokens in
+    total: each asset gets an equal share (at least MIN_VERDICT_TOKENS).
+    """
+    if not reports:
+        return ""
+    per_report = max(MIN_VERDICT_TOKENS, budget // len(reports))
+    return "\n".join(compress_report(ticker, report, daily, per_report) for ticker, report, daily in reports)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Offline tests for agent_logic (fake OpenAI client, no API key or network needed).
+Tests: 1) Concurrent individual analyses keep ticker order, 2) Rate-limit backoff,
+       3) LLM response cache hits, 4) Streaming with time-to-first-token
+"""
+
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+import agent_logic
+from disk_cache import DiskCache
+
+
+@pytest.fixture(autouse=True)
+def _isolated_llm_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(agent_logic, "llm_cache", DiskCache("llm_responses", ttl=3600, path=str(tmp_path / "llm.sqlite3")))
+
+
+class FakeCompletions:
+    """Stand-in for client.chat.completions: echoes the ticker after a fixed latency"""
+
+    def __init__(self, latency=0.3, failures=0):
+        self.latency = latency
+        self.failures = failures
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self.lock:
+            self.calls += 1
+            if self.failures > 0:
+                self.failures -= 1
+                response = SimpleNamespace(status_code=429, headers={"retry-after": "0"}, request=None)
+                raise openai.RateLimitError("Rate limit reached", response=response, body=None)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self.lock:
+            self.in_flight -= 1
+        content = kwargs["messages"][-1]["content"]
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"REPORT {content}"))],
+            usage=SimpleNamespace(total_tokens=10, prompt_tokens=7, completion_tokens=3),
+        )
+
+
+class FakeStreamCompletions(FakeCompletions):
+    """Streams the reply word by word (stream=True) with `latency` before each chunk"""
+
+    def create(self, **kwargs):
+        if not kwargs.get("stream"):
+            return super().create(**kwargs)
+        assert kwargs["stream_options"] == {"include_usage": True}
+        self.calls += 1
+        words = f"REPORT {kwargs['messages'][-1]['content']}".split(" ")
+
+        def chunks():
+            for i, word in enumerate(words):
+                time.sleep(self.latency)
+                text = word if i == 0 else " " + word
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+            yield SimpleNamespace(choices=[], usage=SimpleNamespace(total_tokens=10, prompt_tokens=7, completion_tokens=3))
+        return chunks()
+
+
+def _fake_client(monkeypatch, completions):
+    monkeypatch.setattr(agent_logic, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+
+
+def _bundle(price):
+    return {"weekly": {"price": price, "ema_200": 1}, "daily": {"price": price, "rsi": 50}, "news": []}
+
+
+def test_capital_distribution_runs_analyses_concurrently(monkeypatch):
+    """Individual analyses overlap (bounded by max_concurrency) and reports keep input order"""
+    completions = FakeCompletions(latency=0.3)
+    _fake_client(monkeypatch, completions)
+    tickers_data = {t: _bundle(i + 1) for i, t in enumerate(["AAPL", "NVDA", "TSLA", "MSFT", "SPY", "GOOGL"])}
+
+    start = time.monotonic()
+    verdict, excel_data, metrics = agent_logic.recommend_capital_distribution(1000, tickers_data, max_concurrency=3)
+    elapsed = time.monotonic() - start
+
+    assert completions.max_in_flight == 3
+    assert elapsed < 6 * 0.3  # Sequential would be 7 latencies (6 analysts + boss)
+    reports = excel_data["df_news"]["Reporte_Analista"].tolist()  # Individual reports sheet
+    for ticker, report in zip(tickers_data, reports):
+        assert f"Analiza {ticker} ahora." in report
+    assert metrics["token_usage"]["total_tokens"] == 7 * 10
+
+
+def test_rate_limit_backoff(monkeypatch):
+    """RateLimitError is retried (honouring Retry-After) instead of failing the analysis"""
+    completions = FakeCompletions(latency=0, failures=2)
+    _fake_client(monkeypatch, completions)
+
+    analysis, metrics = agent_logic.analyze_individual_stock_deeply("AAPL", _bundle(100))
+
+    assert completions.calls == 3
+    assert analysis == "REPORT Analiza AAPL ahora."
+    assert metrics is not None
+
+
+def test_llm_cache_hit(monkeypatch):
+    """The same rendered prompt and model params are answered from the cache at zero tokens"""
+    completions = FakeCompletions(latency=0)
+    _fake_client(monkeypatch, completions)
+
+    first, first_metrics = agent_logic.analyze_individual_stock_deeply("AAPL", _bundle(100), reasoning_effort="low")
+    second, second_metrics = agent_logic.analyze_individual_stock_deeply("AAPL", _bundle(100), reasoning_effort="low")
+
+    assert completions.calls == 1
+    assert second == first
+    assert first_metrics["cache_hit"] is False
+    assert second_metrics["cache_hit"] is True
+    assert second_metrics["token_usage"]["total_tokens"] == 0
+
+    # Any change in the prompt data or model parameters is a different key
+    agent_logic.analyze_individual_stock_deeply("AAPL", _bundle(101), reasoning_effort="low")
+    agent_logic.analyze_individual_stock_deeply("AAPL", _bundle(100), reasoning_effort="high")
+    assert completions.calls == 3
+
+
+def test_streaming_analysis(monkeypatch):
+    """Fragments reach on_token as they arrive; TTFT, total latency and usage land in metrics"""
+    completions = FakeStreamCompletions(latency=0.1)
+    _fake_client(monkeypatch, completions)
+    received = []
+
+    analysis, metrics = agent_logic.analyze_individual_stock_deeply("AAPL", _bundle(100), on_token=received.append)
+
+    assert "".join(received) == analysis == "REPORT Analiza AAPL ahora."
+    assert len(received) == 4
+    assert 0.1 <= metrics["time_to_first_token"] < metrics["total_latency"]
+    assert metrics["total_latency"] >= 0.4
+    assert metrics["token_usage"]["total_tokens"] == 10
+
+    # Streamed answers are cached like any other and replayed as a single fragment
+    replay = []
+    cached, cached_metrics = agent_logic.analyze_individual_stock_deeply("AAPL", _bundle(100), on_token=replay.append)
+    assert cached == analysis and replay == [analysis]
+    assert cached_metrics["cache_hit"] is True and completions.calls == 1
+
+    # Portfolio: only the final verdict streams
+    verdict_tokens = []
+    verdict, _, portfolio_metrics = agent_logic.recommend_capital_distribution(
+        1000, {"NVDA": _bundle(1)}, on_token=verdict_tokens.append)
+    assert "".join(verdict_tokens) == verdict
+    assert portfolio_metrics["time_to_first_token"] is not None
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Offline tests for chart_data (synthetic OHLCV, no network needed).
+Tests: 1) LTTB keeps endpoints and extremes, 2) OHLC bucket aggregation,
+       3) Windowed chart payload (full-resolution window + reduced overview)
+       4) History version used as the figure cache key
+"""
+
+import numpy as np
+import pandas as pd
+
+from calculate_indicators import calculate_indicators, add_signal_columns
+from chart_data import lttb_indices, aggregate_ohlc, prepare_chart_data, MACD_HIST_COLORS, history_version
+from test_indicators import _make_ohlcv
+
+
+def test_lttb_keeps_shape():
+    """n_out points, first/last kept, an isolated spike survives, warm-up NaNs skipped"""
+    values = np.sin(np.linspace(0, 20, 2000))
+    values[:30] = np.nan
+    values[1234] = 50.0
+
+    indices = lttb_indices(values, 200)
+
+    assert len(indices) == 200
+    assert indices[0] == 30 and indices[-1] == 1999
+    assert 1234 in indices
+    assert np.all(np.diff(indices) > 0)
+    assert np.array_equal(lttb_indices(values[:100], 200), np.arange(30, 100))
+
+
+def test_aggregate_ohlc():
+    """Each bucket opens at its first bar, closes at its last and spans their high/low"""
+    bars = _make_ohlcv(n=1000)
+    buckets = aggregate_ohlc(bars, 100)
+
+    assert len(buckets) == 100
+    first = bars.iloc[:10]
+    assert buckets.index[0] == first.index[0]
+    assert buckets['Open'].iloc[0] == first['Open'].iloc[0]
+    assert buckets['High'].iloc[0] == first['High'].max()
+    assert buckets['Low'].iloc[0] == first['Low'].min()
+    assert buckets['Close'].iloc[-1] == bars['Close'].iloc[-1]
+
+
+def test_prepare_chart_data_window():
+    """Last window_bars at full resolution, older bars reduced, vectorized MACD colours"""
+    df = add_signal_columns(calculate_indicators(_make_ohlcv()))
+    chart = prepare_chart_data(df, window_bars=252, overview_points=150)
+
+    window = df.iloc[-252:]
+    assert chart['window_start'] == window.index[0]
+    assert chart['candles'].loc[window.index].equals(window[['Open', 'High', 'Low', 'Close']])
+    assert len(chart['candles']) == 150 + 252
+    assert len(chart['lines']['EMA_200']) == 150 + 252
+    pd.testing.assert_series_equal(chart['lines']['RSI'].iloc[-252:], window['RSI'], check_freq=False)
+
+    expected_colors = [MACD_HIST_COLORS[0] if v >= 0 else MACD_HIST_COLORS[1] for v in chart['lines']['MACD_Hist']]
+    assert list(chart['macd_colors']) == expected_colors
+    assert chart['buy'].index.equals(df.index[df['Buy_Signal']])
+
+    # A window longer than the history sends everything untouched
+    full = prepare_chart_data(df, window_bars=len(df) + 10)
+    assert len(full['candles']) == len(df)
+    assert full['lines']['MACD'].equals(df['MACD'])
+
+
+def test_history_version():
+    """Same data -> same key; a new bar or a moved live bar -> new key"""
+    bars = _make_ohlcv(n=300)
+    version = history_version(bars)
+
+    assert history_version(bars.copy()) == version
+    assert history_version(bars.iloc[:-1]) != version
+    live = bars.copy()
+    live.iloc[-1, live.columns.get_loc('Close')] += 0.5
+    assert history_version(live) != version
+    assert history_version(bars.iloc[:0]) is None
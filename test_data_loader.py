@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Offline tests for data_loader (fake yfinance Ticker, no network needed).
+Tests: 1) Persistent OHLCV cache only downloads the missing tail
+       2) Weekly bars resampled from daily history
+       3) Concurrent multi-ticker acquisition with per-ticker timeout (stalls free their slot)
+       4) Fundamentals cache (one stock.info per ticker per day)
+       5) Bulk multi-ticker history download (through the OHLCV store)
+       6) Interval-aware analysis lookback
+       7) Compact (pruned, float32) bundle histories
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+from disk_cache import DiskCache
+from calculate_indicators import calculate_indicators, add_signal_columns, INDICATOR_COLUMNS
+from test_indicators import _make_ohlcv
+
+
+class FakeStock:
+    """Minimal stand-in for yf.Ticker serving a fixed daily history"""
+
+    def __init__(self, bars=None, info=None):
+        self.bars = bars
+        self.calls = []
+        self._info = info or {}
+        self.info_calls = 0
+
+    @property
+    def info(self):
+        self.info_calls += 1
+        return self._info
+
+    def history(self, period=None, interval="1d", start=None, timeout=None):
+        self.calls.append({"period": period, "start": start})
+        if start is not None:
+            return self.bars.loc[self.bars.index >= pd.Timestamp(start, tz=self.bars.index.tz)].copy()
+        since = data_loader._period_start(period, tz=self.bars.index.tz)
+        return self.bars.loc[self.bars.index >= since].copy()
+
+
+def _recent_bars(n=1400):
+    bars = _make_ohlcv(n=n)
+    bars.index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=n, tz="America/New_York")
+    return bars
+
+
+def test_history_cache_delta_fetch(tmp_path, monkeypatch):
+    """Second call downloads only the tail, merges it and matches a fresh download"""
+    monkeypatch.setattr(data_loader, "CACHE_DIR", str(tmp_path))
+    bars = _recent_bars()
+
+    stock = FakeStock(bars.iloc[:-5])
+    first = data_loader.get_history(stock, "AAPL", period="5y", interval="1d")
+    assert stock.calls[-1]["period"] == "5y"
+
+    # Five new sessions, and the previously last bar was still a partial session
+    updated = bars.copy()
+    updated.iloc[-6, updated.columns.get_loc("Close")] *= 1.01
+    stock = FakeStock(updated)
+    second = data_loader.get_history(stock, "AAPL", period="5y", interval="1d")
+
+    assert stock.calls[-1]["start"] == first.index[-2].strftime("%Y-%m-%d")
+    expected = FakeStock(updated).history(period="5y")
+    assert second.index.equals(expected.index)
+    np.testing.assert_allclose(second["Close"].to_numpy(), expected["Close"].to_numpy())
+
+
+def test_history_cache_readjusted_history(tmp_path, monkeypatch):
+    """A changed overlap bar (dividend/split re-adjustment) triggers a full download"""
+    monkeypatch.setattr(data_loader, "CACHE_DIR", str(tmp_path))
+    bars = _recent_bars()
+    data_loader.get_history(FakeStock(bars), "AAPL", period="5y", interval="1d")
+
+    adjusted = bars.copy()
+    adjusted[["Open", "High", "Low", "Close"]] *= 0.99
+    stock = FakeStock(adjusted)
+    result = data_loader.get_history(stock, "AAPL", period="5y", interval="1d")
+
+    assert stock.calls[-1]["period"] == "5y"
+    np.testing.assert_allclose(result["Close"].to_numpy(), stock.history(period="5y")["Close"].to_numpy())
+
+
+def test_resample_to_weekly():
+    """Monday-labelled weeks with proper OHLC aggregation and summed volume"""
+    daily = _recent_bars(n=600)
+    weekly = data_loader.resample_to_weekly(daily, period="2y")
+
+    assert (weekly.index.dayofweek == 0).all()
+    assert weekly.index.tz == daily.index.tz
+
+    week_start = weekly.index[-3]
+    days = daily.loc[(daily.index >= week_start) & (daily.index < week_start + pd.Timedelta(days=7))]
+    bar = weekly.loc[week_start]
+    assert bar["Open"] == days["Open"].iloc[0]
+    assert bar["High"] == days["High"].max()
+    assert bar["Low"] == days["Low"].min()
+    assert bar["Close"] == days["Close"].iloc[-1]
+    assert bar["Volume"] == days["Volume"].sum()
+
+    # Current (partial) week is kept, like Yahoo's native weekly bars
+    assert weekly["Close"].iloc[-1] == daily["Close"].iloc[-1]
+
+
+def test_iter_market_data_concurrent():
+    """Bundles arrive as they finish; errors and a stalled ticker don't block the rest"""
+    delays = {"AAA": 0.3, "BBB": 0.3, "CCC": 0.3, "BAD": 0.0, "SLOW": 3}
+
+    def fake_fetch(ticker):
+        time.sleep(delays[ticker])
+        if ticker == "BAD":
+            raise ValueError("ticker inválido")
+        return {"daily": {"price": 1.0}}, None
+
+    start = time.monotonic()
+    results = list(data_loader.iter_market_data(list(delays) + ["AAA"], fetch=fake_fetch, max_workers=5, timeout=1))
+    elapsed = time.monotonic() - start
+
+    by_ticker = {ticker: (bundle, error) for ticker, bundle, error in results}
+    assert len(results) == 5  # Duplicates are fetched once
+    assert elapsed < 2.5  # Parallel, and SLOW is abandoned after its timeout
+    assert results[0][0] == "BAD"  # Yielded in completion order
+    assert by_ticker["BAD"][1] == "ticker inválido"
+    assert by_ticker["SLOW"][0] is None and "Timeout" in by_ticker["SLOW"][1]
+    assert all(by_ticker[t][1] is None for t in ("AAA", "BBB", "CCC"))
+
+
+def test_iter_market_data_stalled_tickers_free_their_slot():
+    """More stalled tickers than workers: the queued ones start as slots are abandoned, on time"""
+    started = {}
+
+    def fake_fetch(ticker):
+        started[ticker] = time.monotonic() - start
+        time.sleep(3 if ticker.startswith("STALL") else 0.1)
+        return {"daily": {"price": 1.0}}, None
+
+    tickers = ["STALL1", "STALL2", "STALL3", "AAA", "BBB"]
+    start = time.monotonic()
+    arrivals = {}
+    for ticker, bundle, error in data_loader.iter_market_data(tickers, fetch=fake_fetch, max_workers=2, timeout=0.5):
+        arrivals[ticker] = (time.monotonic() - start, error)
+
+    assert all("Timeout" in arrivals[t][1] for t in ("STALL1", "STALL2", "STALL3"))
+    assert arrivals["AAA"][1] is None and arrivals["BBB"][1] is None
+    assert started["STALL3"] >= 0.5  # Queued until a slot is freed: max_workers still holds
+    assert arrivals["BBB"][0] < 2.0  # Not behind the 3s stalls
+
+
+def test_fundamentals_cache(tmp_path, monkeypatch):
+    """stock.info is read once: later calls hit memory, then disk after a restart"""
+    monkeypatch.setattr(data_loader, "fundamentals_cache", DiskCache("fundamentals", ttl=3600, path=str(tmp_path / "f.sqlite3")))
+    monkeypatch.setattr(data_loader, "_fundamentals_memory", {})
+    stocks = {t: FakeStock(info={"sector": "Technology", "forwardPE": 25.0 + i}) for i, t in enumerate(["AAPL", "MSFT", "NVDA"])}
+    monkeypatch.setattr(data_loader.yf, "Ticker", lambda ticker: stocks[ticker])
+
+    first = data_loader.get_fundamentals("AAPL", stocks["AAPL"])
+    assert first["sector"] == "Technology" and first["PER"] == 25.0 and first["PEG"] == "N/A"
+    assert data_loader.get_fundamentals("AAPL", stocks["AAPL"]) == first
+
+    data_loader._fundamentals_memory.clear()  # New process: served from disk
+    assert data_loader.get_fundamentals("AAPL") == first
+    assert stocks["AAPL"].info_calls == 1
+
+    results = data_loader.prefetch_fundamentals(["AAPL", "MSFT", "NVDA", "MSFT"])
+    assert {t: f["PER"] for t, f in results.items()} == {"AAPL": 25.0, "MSFT": 26.0, "NVDA": 27.0}
+    assert [stocks[t].info_calls for t in ("AAPL", "MSFT", "NVDA")] == [1, 1, 1]
+
+    # A nearly expired disk entry keeps its remaining lifetime in memory (not a fresh TTL)
+    stored = data_loader.fundamentals_cache.get("MSFT")
+    stored["fetched_at"] = time.time() - data_loader.FUNDAMENTALS_TTL + 5
+    data_loader.fundamentals_cache.set("MSFT", stored)
+    data_loader._fundamentals_memory.clear()
+    data_loader.get_fundamentals("MSFT")
+    assert data_loader._fundamentals_memory["MSFT"][0] == stored["fetched_at"] + data_loader.FUNDAMENTALS_TTL
+    assert stocks["MSFT"].info_calls == 1
+
+    # Past that lifetime Yahoo is asked again
+    stored["fetched_at"] -= 10
+    data_loader.fundamentals_cache.set("MSFT", stored)
+    data_loader._fundamentals_memory.clear()
+    data_loader.get_fundamentals("MSFT")
+    assert stocks["MSFT"].info_calls == 2
+
+
+def test_bulk_histories(tmp_path, monkeypatch):
+    """One yf.download for the list, split per ticker with indicators, feeding get_multi_timeframe_data"""
+    monkeypatch.setattr(data_loader, "CACHE_DIR", str(tmp_path))
+    frames = {"AAPL": _make_ohlcv(seed=1), "MSFT": _make_ohlcv(seed=2)}
+    calls = []
+
+    def fake_download(tickers, **kwargs):
+        calls.append((tickers, kwargs))
+        panel = pd.concat(frames, axis=1)  # (ticker, field) like group_by='ticker'
+        panel[("BAD", "Close")] = np.nan  # Yahoo returns empty columns for unknown tickers
+        return panel
+
+    monkeypatch.setattr(data_loader.yf, "download", fake_download)
+    histories = data_loader.get_bulk_histories(["aapl", "MSFT", "BAD"])
+
+    assert len(calls) == 1 and calls[0][0] == ["AAPL", "MSFT", "BAD"]
+    assert calls[0][1]["group_by"] == "ticker" and calls[0][1]["threads"] is True
+    assert set(histories) == {"AAPL", "MSFT"}
+    expected = calculate_indicators(frames["MSFT"].copy())
+    for col in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(histories["MSFT"][col].to_numpy(), expected[col].to_numpy(), rtol=1e-9, equal_nan=True)
+
+    # A bulk history replaces the per-ticker download
+    class NoHistoryStock(FakeStock):
+        def history(self, **kwargs):
+            raise AssertionError("history() should not be called")
+
+    monkeypatch.setattr(data_loader, "fundamentals_cache", DiskCache("fundamentals", ttl=3600, path=str(tmp_path / "f.sqlite3")))
+    monkeypatch.setattr(data_loader, "_fundamentals_memory", {})
+    monkeypatch.setattr(data_loader.yf, "Ticker", lambda ticker: NoHistoryStock(info={"sector": "Technology"}))
+    llm_data, hist, _, error = data_loader.get_market_data("MSFT", fetch_news=False, hist=histories["MSFT"])
+    assert error is None
+    assert llm_data["price"] == round(frames["MSFT"]["Close"].iloc[-1], 2)
+    assert hist is histories["MSFT"]
+
+
+def test_bulk_histories_use_store(tmp_path, monkeypatch):
+    """Stored tickers download only their tail in one call; new ones the full period in another"""
+    monkeypatch.setattr(data_loader, "CACHE_DIR", str(tmp_path))
+    frames = {t: _recent_bars() for t in ("AAPL", "MSFT", "NVDA")}
+    calls = []
+
+    def fake_download(tickers, start=None, period=None, **kwargs):
+        calls.append((list(tickers), start, period))
+        since = pd.Timestamp(start, tz="America/New_York") if start else data_loader._period_start(period or "3y", tz="America/New_York")
+        return pd.concat({t: frames[t].loc[frames[t].index >= since] for t in tickers}, axis=1)
+
+    monkeypatch.setattr(data_loader.yf, "download", fake_download)
+    first = data_loader.get_bulk_histories(["AAPL", "MSFT"])
+    assert [c[0] for c in calls] == [["AAPL", "MSFT"]]
+    assert len(first["AAPL"]) >= data_loader.ANALYSIS_BARS
+
+    # A new bar for everyone: AAPL/MSFT fetch only the tail from the store, NVDA the full window
+    for t, bars in frames.items():
+        extra = bars.iloc[[-1]].copy()
+        extra.index = extra.index + pd.offsets.BDay(1)
+        frames[t] = pd.concat([bars, extra])
+    calls.clear()
+    second = data_loader.get_bulk_histories(["AAPL", "MSFT", "NVDA"])
+
+    assert len(calls) == 2
+    assert calls[0][0] == ["AAPL", "MSFT"] and calls[0][1] == first["AAPL"].index[-2].strftime("%Y-%m-%d")
+    assert calls[1][0] == ["NVDA"]
+    assert second["AAPL"].index[-1] == frames["AAPL"].index[-1]
+    assert len(second["AAPL"]) == len(second["NVDA"])
+    np.testing.assert_allclose(second["MSFT"]["EMA_200"].to_numpy(),
+                               calculate_indicators(second["MSFT"][["Open", "High", "Low", "Close", "Volume"]].copy())["EMA_200"].to_numpy(),
+                               rtol=1e-9, equal_nan=True)
+
+    # The per-ticker path reads the same store (no full download)
+    stock = FakeStock(frames["NVDA"])
+    data_loader.get_history(stock, "NVDA", period=data_loader.lookback_period("1d"))
+    assert stock.calls[-1]["start"] is not None
+
+
+def test_analysis_lookback(tmp_path, monkeypatch):
+    """Analysis downloads only the warm-up window; the chart's longer period is fetched on demand"""
+    monkeypatch.setattr(data_loader, "CACHE_DIR", str(tmp_path))
+    assert data_loader.lookback_period("1d") == "3y"
+    assert data_loader.lookback_period("1wk") == data_loader.WEEKLY_PERIOD == "2y"  # Same window on both weekly paths
+
+    bars = _recent_bars()
+    stock = FakeStock(bars)
+    hist = data_loader.get_history(stock, "AAPL", period=data_loader.lookback_period("1d"))
+    assert stock.calls[-1]["period"] is None  # "3y" isn't a Yahoo range: sent as start=
+    assert len(hist) >= data_loader.ANALYSIS_BARS
+
+    monkeypatch.setattr(data_loader.yf, "Ticker", lambda ticker: stock)
+    chart = data_loader.get_chart_history("AAPL")
+    assert stock.calls[-1]["period"] == data_loader.CHART_PERIOD
+    assert len(chart) > len(hist) and "EMA_200" in chart.columns
+
+
+def test_shared_store_keeps_longest_window(tmp_path, monkeypatch):
+    """5y -> 3y -> 5y: the shorter call doesn't shrink the store the chart window relies on"""
+    monkeypatch.setattr(data_loader, "CACHE_DIR", str(tmp_path))
+    stock = FakeStock(_recent_bars())
+
+    five_years = data_loader.get_history(stock, "AAPL", period="5y")
+    three_years = data_loader.get_history(stock, "AAPL", period="3y")
+    again = data_loader.get_history(stock, "AAPL", period="5y")
+
+    assert len(three_years) < len(five_years)
+    assert stock.calls[-1]["start"] is not None  # Still served incrementally, no full download
+    assert len(again) == len(five_years)
+    assert again.index[0] == five_years.index[0]
+
+
+def test_compact_history_precision():
+    """Pruned columns, float32 indicators within float32 rounding, and a smaller footprint"""
+    full = add_signal_columns(calculate_indicators(_make_ohlcv()))
+    compact = data_loader.compact_history(full)
+
+    assert list(compact.columns) == data_loader.BUNDLE_COLUMNS
+    assert compact["Close"].dtype == np.float64
+    assert compact["Buy_Signal"].dtype == bool
+    assert all(compact[col].dtype == np.float32 for col in INDICATOR_COLUMNS)
+    errors = data_loader.float32_precision_error(full, compact)
+    assert set(errors) == set(INDICATOR_COLUMNS)
+    assert max(errors.values()) <= 2 ** -24
+    assert compact["EMA_200"].isna().equals(full["EMA_200"].isna())
+
+    full_size = data_loader.bundle_memory_report({"daily_hist": full, "weekly_hist": full})
+    compact_size = data_loader.bundle_memory_report({"daily_hist": compact, "weekly_hist": compact})
+    assert full_size["total"] == 2 * full_size["daily_hist"]
+    assert compact_size["total"] < 0.7 * full_size["total"]
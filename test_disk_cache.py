@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Offline tests for disk_cache.DiskCache.
+Tests: 1) Round trip and TTL expiry, 2) Size-based LRU eviction
+"""
+
+import time
+
+from disk_cache import DiskCache
+
+
+def test_round_trip_and_ttl(tmp_path):
+    cache = DiskCache("test", ttl=0.5, path=str(tmp_path / "cache.sqlite3"))
+    key = DiskCache.make_key("AAPL", {"model": "gpt-5.1"})
+
+    assert cache.get(key) is None
+    cache.set(key, {"analysis": "BUY", "tokens": 10})
+    assert cache.get(key) == {"analysis": "BUY", "tokens": 10}
+
+    # Same content -> same key, regardless of dict ordering
+    assert DiskCache.make_key("AAPL", {"model": "gpt-5.1"}) == key
+
+    time.sleep(0.6)
+    assert cache.get(key) is None
+
+
+def test_size_eviction_drops_least_recently_used(tmp_path):
+    cache = DiskCache("test", ttl=3600, max_bytes=350, path=str(tmp_path / "cache.sqlite3"))
+    for name in ("a", "b", "c"):
+        cache.set(name, "x" * 100)
+        time.sleep(0.01)
+
+    # Touch "a" so "b" becomes the least recently used entry
+    cache.get("a")
+    time.sleep(0.01)
+    cache.set("d", "x" * 100)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("d") is not None
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Offline tests for http_transport.HttpTransport (fake session, no network needed).
+Tests: 1) Retries on 503 with backoff, 2) Conditional GET reuses the body on 304,
+       3) Per-host concurrency limit
+"""
+
+import threading
+import time
+
+from http_transport import HttpTransport
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, responses, latency=0.0):
+        self.responses = list(responses)
+        self.latency = latency
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=None, **kwargs):
+        with self.lock:
+            self.requests.append({"url": url, "headers": dict(headers or {}), "timeout": timeout})
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self.lock:
+            self.in_flight -= 1
+            return self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+
+
+def test_retries_transient_errors():
+    transport = HttpTransport(max_retries=2, backoff=0.01)
+    transport.session = FakeSession([FakeResponse(503), FakeResponse(429, headers={"Retry-After": "0"}), FakeResponse(200, b"ok")])
+
+    assert transport.fetch("https://example.com/feed") == b"ok"
+    assert len(transport.session.requests) == 3
+    assert transport.session.requests[0]["timeout"] == transport.timeout
+
+
+def test_conditional_get_uses_cached_body():
+    transport = HttpTransport()
+    transport.session = FakeSession([FakeResponse(200, b"<rss/>", {"ETag": '"v1"'}), FakeResponse(304)])
+
+    assert transport.fetch("https://example.com/feed", conditional=True) == b"<rss/>"
+    assert transport.fetch("https://example.com/feed", conditional=True) == b"<rss/>"
+    assert transport.session.requests[1]["headers"]["If-None-Match"] == '"v1"'
+
+
+def test_per_host_limit():
+    transport = HttpTransport(per_host_limit=2)
+    transport.session = FakeSession([FakeResponse(200, b"x")], latency=0.1)
+
+    threads = [threading.Thread(target=transport.fetch, args=("https://example.com/a",)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert transport.session.max_in_flight == 2
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Offline tests for calculate_indicators (synthetic OHLCV, no network needed).
+Tests: 1) Vectorized Wilder smoothing parity against the original per-row loop
+       2) Incremental indicator updates match a full recalculation, at O(new rows) cost
+       3) Batch panel computation matches per-ticker calculate_indicators
+       4) Warm-up lookback converges to the full-history values
+       5) Golden Trend Momentum signal columns
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from calculate_indicators import (wilder_smoothing, calculate_indicators, calculate_indicators_batch,
+                                  IncrementalIndicators, INDICATOR_COLUMNS, WARMUP_TOLERANCE, warmup_bars,
+                                  add_signal_columns, SIGNAL_COLUMNS)
+
+
+def _make_ohlcv(n=1300, seed=42):
+    """Random-walk OHLCV frame shaped like yfinance's history() output"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    open_ = close * (1 + rng.normal(0, 0.005, n))
+    high = np.maximum(open_, close) * (1 + rng.random(n) * 0.02)
+    low = np.minimum(open_, close) * (1 - rng.random(n) * 0.02)
+    volume = rng.integers(1_000_000, 50_000_000, n).astype(float)
+    index = pd.date_range("2020-01-01", periods=n, freq="B", tz="America/New_York")
+    return pd.DataFrame({
+        "Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume,
+        "Dividends": 0.0, "Stock Splits": 0.0
+    }, index=index)
+
+
+def _wilder_smoothing_loop(data, period=14):
+    """Reference: the original per-row implementation of wilder_smoothing"""
+    result = pd.Series(index=data.index, dtype=float)
+    result.iloc[period - 1] = data.iloc[:period].mean()
+    for i in range(period, len(data)):
+        result.iloc[i] = (result.iloc[i - 1] * (period - 1) + data.iloc[i]) / period
+    return result
+
+
+def _assert_same_series(actual, expected):
+    assert actual.isna().equals(expected.isna())
+    np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy(), rtol=1e-12, atol=1e-12, equal_nan=True)
+
+
+def test_wilder_smoothing_parity():
+    """Vectorized Wilder smoothing matches the loop, including the NaN seed of diff()"""
+    hist = _make_ohlcv()
+    plus_dm = hist['High'].diff()
+    plus_dm[plus_dm < 0] = 0
+
+    for period in (3, 14, 28):
+        _assert_same_series(wilder_smoothing(plus_dm, period), _wilder_smoothing_loop(plus_dm, period))
+
+    # A NaN after the seed propagates to the end, exactly like the loop
+    gapped = plus_dm.copy()
+    gapped.iloc[500] = np.nan
+    _assert_same_series(wilder_smoothing(gapped), _wilder_smoothing_loop(gapped))
+
+    # Leading NaNs (e.g. DX before +DI/-DI exist) are skipped by the seed mean
+    dx = plus_dm.copy()
+    dx.iloc[:13] = np.nan
+    _assert_same_series(wilder_smoothing(dx), _wilder_smoothing_loop(dx))
+
+
+def test_wilder_smoothing_short_series():
+    """Series shorter than the period return all-NaN instead of raising"""
+    short = pd.Series([1.0, 2.0, 3.0])
+    assert wilder_smoothing(short, period=14).isna().all()
+
+
+def test_calculate_indicators_adx_range():
+    """ADX/ATR stay finite and ADX within 0-100 on five years of daily bars"""
+    hist = calculate_indicators(_make_ohlcv())
+    assert hist['ATR'].iloc[-1] > 0
+    assert 0 <= hist['ADX'].iloc[-1] <= 100
+    assert hist['ADX'].iloc[27:].notna().all()
+
+
+def test_incremental_update_parity():
+    """Appending bars one/N at a time (and revising the last one) equals a full pass"""
+    bars = _make_ohlcv()
+    full = calculate_indicators(bars.copy())
+
+    inc = IncrementalIndicators(bars.iloc[:1000].copy())
+    inc.update(bars.iloc[1000:1001])
+    inc.update(bars.iloc[1001:1200])
+
+    # Intraday revision of the same bar must replace it, not append it
+    provisional = bars.iloc[1200:1201].copy()
+    provisional['Close'] *= 1.05
+    inc.update(provisional)
+    rows = inc.update(bars.iloc[1200:])
+    result = inc.hist
+
+    assert rows.index.equals(full.index[1200:])  # update() returns only the new rows
+    assert result.index.equals(full.index)
+    assert list(result.columns) == list(full.columns)
+    for col in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(result[col].to_numpy(), full[col].to_numpy(), rtol=1e-9, equal_nan=True)
+
+
+def test_incremental_update_cost_independent_of_history():
+    """A one-bar update costs the same on 1,250 or 10,000 bars, well below a full pass"""
+    def median_update(n):
+        bars = _make_ohlcv(n=n + 50)
+        inc = IncrementalIndicators(bars.iloc[:n].copy())
+        timings = []
+        for i in range(n, n + 50):
+            start = time.perf_counter()
+            inc.update(bars.iloc[i:i + 1])
+            timings.append(time.perf_counter() - start)
+        return float(np.median(timings))
+
+    bars = _make_ohlcv(n=1250)
+    full = []
+    for _ in range(5):
+        start = time.perf_counter()
+        calculate_indicators(bars.copy())
+        full.append(time.perf_counter() - start)
+
+    short, long = median_update(1250), median_update(10000)
+    assert long < 2 * short  # O(new rows), not O(len(hist))
+    assert short < float(np.median(full)) / 4
+
+
+def test_incremental_update_short_history_falls_back():
+    """Without enough warm-up bars the update recomputes the whole frame"""
+    bars = _make_ohlcv(n=60)
+    inc = IncrementalIndicators(bars.iloc[:10].copy())
+    rows = inc.update(bars.iloc[10:])
+    result = inc.hist
+    full = calculate_indicators(bars.copy())
+    assert rows.index.equals(full.index[10:])
+    for col in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(result[col].to_numpy(), full[col].to_numpy(), rtol=1e-9, equal_nan=True)
+
+
+def test_batch_panel_parity():
+    """Batch panel results equal calculate_indicators per ticker, across calendars and layouts"""
+    frames = {
+        "AAA": _make_ohlcv(seed=1),
+        "BBB": _make_ohlcv(seed=2),
+        "IPO": _make_ohlcv(seed=3).iloc[400:],  # Listed later: leading NaN rows in the panel
+    }
+    crypto = _make_ohlcv(n=1820, seed=4)
+    crypto.index = pd.date_range("2020-01-01", periods=1820, freq="D", tz="America/New_York")
+    frames["BTC-USD"] = crypto  # Trades on weekends: other tickers get NaN rows there
+
+    panel = pd.concat(frames, axis=1, sort=True).swaplevel(axis=1).sort_index(axis=1)  # (field, ticker) like yf.download
+
+    for layout in (panel, panel.swaplevel(axis=1)):
+        results = calculate_indicators_batch(layout)
+        assert set(results) == set(frames)
+        for ticker, bars in frames.items():
+            expected = calculate_indicators(bars.copy())
+            assert results[ticker].index.equals(expected.index)
+            for col in INDICATOR_COLUMNS:
+                np.testing.assert_allclose(results[ticker][col].to_numpy(), expected[col].to_numpy(),
+                                           rtol=1e-9, equal_nan=True)
+
+
+def test_warmup_lookback_converges():
+    """warmup_bars() of history (+20 slope bars) reproduce the last bars of a 5y computation"""
+    bars = _make_ohlcv()
+    lookback = warmup_bars() + 20
+    full = calculate_indicators(bars.copy()).iloc[-20:]
+    trimmed = calculate_indicators(bars.iloc[-lookback:].copy()).iloc[-20:]
+
+    for col in INDICATOR_COLUMNS:
+        if col == 'OBV':
+            # Running sum: different origin, same changes
+            np.testing.assert_allclose(trimmed[col].diff().iloc[1:], full[col].diff().iloc[1:], rtol=1e-9)
+        else:
+            np.testing.assert_allclose(trimmed[col].to_numpy(), full[col].to_numpy(), rtol=WARMUP_TOLERANCE)
+    assert warmup_bars(1e-2) < warmup_bars()
+
+
+def test_signal_columns():
+    """Vectorized signals equal the chart's original shift()-based masks, added in place"""
+    df = calculate_indicators(_make_ohlcv())
+    cross_up = (df['MACD'] > df['MACD_Signal']) & (df['MACD'].shift(1) <= df['MACD_Signal'].shift(1))
+    cross_down = (df['MACD'] < df['MACD_Signal']) & (df['MACD'].shift(1) >= df['MACD_Signal'].shift(1))
+    buy = (df['Close'] > df['EMA_200']) & cross_up & (df['RSI'] < 70)
+    sell = (df['Close'] < df['EMA_200']) & cross_down & (df['RSI'] > 30)
+
+    result = add_signal_columns(df)
+    assert result is df
+    assert list(df.columns[-len(SIGNAL_COLUMNS):]) == SIGNAL_COLUMNS
+    for column, expected in zip(SIGNAL_COLUMNS, (cross_up, cross_down, buy, sell)):
+        assert df[column].equals(expected.rename(column))
+    assert df['Buy_Signal'].any() and df['Sell_Signal'].any()
+
+
+if __name__ == "__main__":
+    test_wilder_smoothing_parity()
+    test_wilder_smoothing_short_series()
+    test_calculate_indicators_adx_range()
+    test_incremental_update_parity()
+    test_incremental_update_short_history_falls_back()
+    test_batch_panel_parity()
+    test_warmup_lookback_converges()
+    test_signal_columns()
+    print("✅ All indicator tests passed")
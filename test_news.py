@@ -1,4 +1,8 @@
-from news_agents import NewsAggregator
+from news_agents import NewsAggregator, NewsAgent, NewsStore, SharedFeedCache, GoogleNewsAgent, TitleDeduplicator, FinVizNewsAgent
+import concurrent.futures
+from datetime import datetime, timedelta
+import random
+import threading
 import time
 
 def test_news_fetching():
@@ -23,5 +27,315 @@ def test_news_fetching():
     for n in news[:5]:
         print(f"- [{n['source']}] {n['title']} ({n['published']})")
 
+class FakeAgent(NewsAgent):
+    """Offline source that records which windows it was asked for"""
+    name = "Fake"
+    cache_ttl = 60
+
+    def __init__(self):
+        self.requests = []
+        self.items = []
+
+    def get_news(self, ticker, days=7):
+        self.requests.append(days)
+        return list(self.items)
+
+def _item(title, hours_ago):
+    ts = time.time() - hours_ago * 3600
+    return {"source": "Fake", "title": title, "link": f"https://example.com/{title}",
+            "published": time.strftime('%Y-%m-%d %H:%M', time.localtime(ts)), "timestamp": ts, "description": ""}
+
+def test_news_store_freshness(tmp_path):
+    """Fresh entries skip the network; stale ones fetch only the gap and merge by link"""
+    agent = FakeAgent()
+    aggregator = NewsAggregator(store=NewsStore(path=str(tmp_path / "news.sqlite3")))
+    aggregator.agents = [agent]
+
+    agent.items = [_item("earnings-beat", 24 * 30), _item("guidance-raised", 2)]
+    assert len(aggregator.get_consolidated_news("AAPL", days=90)) == 2
+    assert agent.requests == [90]
+
+    # Within cache_ttl: served from the store, also for a narrower window
+    assert len(aggregator.get_consolidated_news("AAPL", days=90)) == 2
+    assert len(aggregator.get_consolidated_news("AAPL", days=7)) == 1
+    assert agent.requests == [90]
+
+    # Past cache_ttl: only the last day is requested and merged with the stored items
+    entry = aggregator.store.load("AAPL", agent.name)
+    entry['fetched_at'] -= 2 * agent.cache_ttl
+    aggregator.store.save("AAPL", agent.name, entry)
+    agent.items = [_item("guidance-raised", 2), _item("new-product", 1)]
+    titles = {n['title'] for n in aggregator.get_consolidated_news("AAPL", days=90)}
+    assert agent.requests == [90, 1]
+    assert titles == {"earnings-beat", "guidance-raised", "new-product"}
+
+    # A stale entry whose refresh fails (agent returns []) keeps its items and stays stale
+    entry = aggregator.store.load("AAPL", agent.name)
+    entry['fetched_at'] -= 2 * agent.cache_ttl
+    aggregator.store.save("AAPL", agent.name, entry)
+    agent.items = []
+    assert len(aggregator.get_consolidated_news("AAPL", days=90)) == 3
+    assert aggregator.store.load("AAPL", agent.name)['fetched_at'] == entry['fetched_at']
+    agent.items = [_item("recovered", 1)]
+    assert len(aggregator.get_consolidated_news("AAPL", days=90)) == 4  # Retried, not skipped for cache_ttl
+    assert agent.requests == [90, 1, 1, 1]
+
+    # A longer window than the stored one needs a full fetch
+    aggregator.get_consolidated_news("AAPL", days=180)
+    assert agent.requests == [90, 1, 1, 1, 180]
+
+def test_shared_feed_single_flight():
+    """Concurrent callers share one download; the result is reused until the TTL expires"""
+    cache = SharedFeedCache(ttl=0.5)
+    downloads = []
+
+    def loader():
+        downloads.append(1)
+        time.sleep(0.2)
+        return {"entries": ["item"]}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(executor.map(lambda _: cache.get("feed", loader), range(10)))
+    assert len(downloads) == 1
+    assert all(r is results[0] for r in results)
+
+    assert cache.get("feed", loader) is results[0]
+    time.sleep(0.6)
+    cache.get("feed", loader)
+    assert len(downloads) == 2
+
+    # Results rejected by should_cache are not kept
+    cache.get("empty", lambda: {"entries": []}, should_cache=lambda f: bool(f["entries"]))
+    cache.get("empty", loader, should_cache=lambda f: bool(f["entries"]))
+    assert len(downloads) == 3
+
+RSS_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"><channel><title>Feed</title>
+<item><title>{title}</title><link>https://example.com/{slug}</link>
+<pubDate>{pub_date}</pubDate><description>Summary of {title}</description>
+<source url="https://example.com">Reuters</source></item>
+</channel></rss>"""
+
+class FakeTransport:
+    """Stand-in for HttpTransport serving one RSS item per URL after a fixed latency"""
+
+    def __init__(self, latency=0.3):
+        self.latency = latency
+        self.urls = []
+
+    def fetch(self, url, headers=None, timeout=None, conditional=False):
+        self.urls.append(url)
+        time.sleep(self.latency)
+        query = url.split("q=")[1].split("&")[0]
+        pub_date = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() - 3600))
+        return RSS_TEMPLATE.format(title=f"Headline {query}", slug=query, pub_date=pub_date).encode("utf-8")
+
+def test_google_queries_run_concurrently():
+    """The three Google News queries overlap on the injected transport"""
+    transport = FakeTransport(latency=0.3)
+    start = time.time()
+    news = GoogleNewsAgent(transport).get_news("AAPL", days=7)
+    elapsed = time.time() - start
+
+    assert elapsed < 0.6  # Sequential would take 0.9s
+    assert len(transport.urls) == 3
+    assert len(news) == 3
+    assert news[0]["source"] == "Reuters"
+    assert "earnings" in news[0]["title"]  # Query order is kept
+
+def test_async_news_for_many_tickers(tmp_path):
+    """Tickers x sources run on one loop under a global cap; results come back per ticker"""
+    in_flight = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    class SlowAgent(FakeAgent):
+        def get_news(self, ticker, days=7):
+            with lock:
+                in_flight["now"] += 1
+                in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            time.sleep(0.2)
+            with lock:
+                in_flight["now"] -= 1
+            return [_item(f"{ticker}-{self.name}", 1)]
+
+    aggregator = NewsAggregator(use_cache=False)
+    aggregator.agents = []
+    for name in ("A", "B", "C"):
+        agent = SlowAgent()
+        agent.name = name
+        aggregator.agents.append(agent)
+
+    tickers = ["AAPL", "NVDA", "TSLA", "MSFT"]
+    start = time.time()
+    results = aggregator.get_news_for_tickers(tickers, days=7, max_concurrency=6)
+    elapsed = time.time() - start
+
+    assert list(results) == tickers
+    assert all(len(news) == 3 for news in results.values())
+    assert in_flight["max"] == 6
+    assert elapsed < 1.0  # 12 calls of 0.2s, 6 at a time -> ~0.4s (sequential: 2.4s)
+
+def test_deadline_returns_partial_results():
+    """A stalled source is dropped at the deadline; the others' news and metadata come back"""
+    class NamedAgent(FakeAgent):
+        def __init__(self, name, delay):
+            super().__init__()
+            self.name = name
+            self.delay = delay
+
+        def get_news(self, ticker, days=7):
+            time.sleep(self.delay)
+            return [_item(f"{self.name}-headline", 1)]
+
+    aggregator = NewsAggregator(use_cache=False)
+    aggregator.agents = [NamedAgent("Fast", 0.05), NamedAgent("Stalled", 1.5)]
+
+    start = time.time()
+    news, metadata = aggregator.get_consolidated_news("AAPL", days=7, deadline=0.4, with_metadata=True)
+    elapsed = time.time() - start
+
+    assert elapsed < 1.0
+    assert [n["title"] for n in news] == ["Fast-headline"]
+    assert metadata["sources"]["Fast"]["status"] == "ok"
+    assert metadata["sources"]["Fast"]["items"] == 1
+    assert metadata["sources"]["Stalled"]["status"] == "timeout"
+
+    # Same per-source deadline on the async path
+    start = time.time()
+    results = aggregator.get_news_for_tickers(["AAPL", "NVDA"], days=7, deadline=0.4)
+    assert time.time() - start < 1.0
+    assert [n["title"] for n in results["NVDA"]] == ["Fast-headline"]
+
+def test_stalled_source_across_many_tickers():
+    """Abandoned stalled calls keep their slot, so later fast calls never queue past their deadline"""
+    in_flight = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    class NamedAgent(FakeAgent):
+        def __init__(self, name, delay):
+            super().__init__()
+            self.name = name
+            self.delay = delay
+
+        def get_news(self, ticker, days=7):
+            with lock:
+                in_flight["now"] += 1
+                in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            time.sleep(self.delay)
+            with lock:
+                in_flight["now"] -= 1
+            return [_item(f"{ticker}-{self.name}", 1)]
+
+    aggregator = NewsAggregator(use_cache=False)
+    aggregator.agents = [NamedAgent("Fast", 0.05), NamedAgent("Stalled", 0.8)]
+    tickers = [f"T{i}" for i in range(8)]
+
+    results = aggregator.get_news_for_tickers(tickers, days=7, max_concurrency=4, deadline=0.3)
+
+    assert {t: [n["title"] for n in news] for t, news in results.items()} == {t: [f"{t}-Fast"] for t in tickers}
+    assert in_flight["max"] <= 4
+
+def test_near_duplicate_titles():
+    """Syndicated headlines that differ by a word or publisher suffix collapse to the first one"""
+    titles = [
+        "Apple beats Q3 earnings estimates as iPhone sales surge - Reuters",
+        "Apple beats Q3 earnings estimates as iPhone sales jump - Yahoo Finance",
+        "APPLE BEATS Q3 EARNINGS ESTIMATES AS IPHONE SALES SURGE",
+        "Nvidia shares hit record high on AI demand",
+        "NVIDIA Shares Hit Record High On AI Demand, Analysts Say",
+        "Apple stock rises after earnings",
+        "Apple stock falls after earnings",
+        "Tesla to recall 2 million vehicles over Autopilot",
+    ]
+    items = [_item(title, hours_ago=i) for i, title in enumerate(titles)]
+    unique = [n["title"] for n in TitleDeduplicator().deduplicate(items)]
+
+    assert unique == [titles[0], titles[3], titles[5], titles[6], titles[7]]
+
+    # Long, otherwise identical headlines with opposite meanings are both kept
+    opposite = [
+        ("Tesla shares rise after third-quarter deliveries beat Wall Street expectations",
+         "Tesla shares fall after third-quarter deliveries beat Wall Street expectations"),
+        ("Fed expected to raise interest rates at next week's policy meeting, economists say",
+         "Fed expected to cut interest rates at next week's policy meeting, economists say"),
+        ("Nvidia stock jumps 5% as data center revenue tops analyst forecasts",
+         "Nvidia stock drops 5% as data center revenue tops analyst forecasts"),
+    ]
+    dedup = TitleDeduplicator()
+    # A final clause after " - " / " | " is only dropped when it names a publisher
+    for pair in [("Nvidia Q3 results - revenue beats estimates", "Nvidia Q3 results - revenue misses estimates"),
+                 ("Fed holds rates | Markets react", "Fed holds rates | Gold slides")]:
+        assert [n["title"] for n in dedup.deduplicate([_item(t, 1) for t in pair])] == list(pair)
+    same = [dict(_item("Fed holds rates steady as inflation cools - Daily Ledger", 1), source="Daily Ledger"),
+            _item("Fed holds rates steady as inflation cools", 2)]
+    assert len(dedup.deduplicate(same)) == 1
+    for pair in opposite:
+        shingles = [dedup.shingles(dedup.normalize(t)) for t in pair]
+        assert len(shingles[0] & shingles[1]) / len(shingles[0] | shingles[1]) >= dedup.threshold
+        assert [n["title"] for n in dedup.deduplicate([_item(t, 1) for t in pair])] == list(pair)
+
+    # Hundreds of distinct headlines stay distinct and cheap to check
+    rng = random.Random(7)
+    vocab = ["shares", "rally", "slump", "guidance", "merger", "chip", "cloud", "lawsuit", "dividend", "buyback",
+             "outlook", "record", "deal", "cuts", "jobs", "launch", "probe", "upgrade", "downgrade", "forecast"]
+    many = [_item(" ".join(rng.sample(vocab, 7)), 1) for _ in range(500)]
+    start = time.time()
+    assert len(TitleDeduplicator().deduplicate(many)) == 500
+    assert time.time() - start < 1.0
+
+FINVIZ_PAGE = """<html><head><title>AAPL</title></head><body>
+<table class="snapshot-table"><tr><td>P/E</td><td>30.1</td></tr></table>
+<table width="100%" class="fullview-news-outer news-table" id="news-table">
+<tr><td width="130" align="right">Today 09:30AM</td><td align="left"><div class="news-link-container">
+<div class="news-link-left"><a class="tab-link-news" href="https://example.com/a">Apple unveils new chip &amp; AI tools</a></div>
+<div class="news-link-right"><span>(Reuters)</span></div></div></td></tr>
+<tr><td align="right">08:15AM</td><td align="left"><a class="tab-link-news" href="/news/123/apple-supplier">Apple supplier raises outlook</a></td></tr>
+<tr><td align="right">{old_day} 04:05PM</td><td align="left"><a class="tab-link-news" href="https://example.com/c">Apple shares close higher</a></td></tr>
+<tr><td align="right">{stale_day} 10:00AM</td><td align="left"><a class="tab-link-news" href="https://example.com/d">Old headline</a></td></tr>
+</table>
+"""
+
+class FakeStreamResponse:
+    """Streams a page in small chunks and records how many were consumed"""
+
+    def __init__(self, page, chunk_size=64):
+        self.chunks = [page[i:i + chunk_size] for i in range(0, len(page), chunk_size)]
+        self.served = 0
+        self.encoding = "utf-8"
+        self.closed = False
+
+    def iter_content(self, chunk_size=None, decode_unicode=False):
+        for chunk in self.chunks:
+            self.served += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+def test_finviz_news_table_parsing():
+    """Relative FinViz dates become real timestamps and the page after the table is never read"""
+    now = datetime.now(FinVizNewsAgent.timezone)
+    old_day = (now - timedelta(days=2)).strftime("%b-%d-%y")
+    stale_day = (now - timedelta(days=30)).strftime("%b-%d-%y")
+    page = FINVIZ_PAGE.format(old_day=old_day, stale_day=stale_day) + "<div>" + "x" * 100_000 + "</div></body></html>"
+    response = FakeStreamResponse(page)
+
+    class StreamTransport:
+        def get(self, url, headers=None, timeout=None, **kwargs):
+            assert kwargs.get("stream") is True
+            return response
+
+    news = FinVizNewsAgent(transport=StreamTransport()).get_news("AAPL", days=7)
+
+    assert [n["title"] for n in news] == ["Apple unveils new chip & AI tools", "Apple supplier raises outlook",
+                                          "Apple shares close higher"]
+    assert news[1]["link"] == "https://finviz.com/news/123/apple-supplier"
+    today_930 = now.replace(hour=9, minute=30, second=0, microsecond=0)
+    assert news[0]["timestamp"] == today_930.timestamp()
+    assert news[0]["timestamp"] > news[1]["timestamp"] > news[2]["timestamp"]
+    assert news[2]["published"] == datetime.fromtimestamp(news[2]["timestamp"]).strftime("%Y-%m-%d %H:%M")
+    assert response.closed
+    assert response.served < len(response.chunks) / 10
+
 if __name__ == "__main__":
     test_news_fetching()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Offline tests for prompt_budget (no API key or network needed).
+Tests: 1) Token counting and truncation, 2) Offline estimate never undercounts tiktoken,
+       3) News ranked by recency/relevance within budget, 4) Analyst reports compressed
+       to verdicts, 5) CIO prompt stays flat as tickers grow
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import prompt_budget
+from prompt_budget import (count_tokens, estimate_tokens, truncate_to_tokens, fit_lines, rank_news,
+                           build_news_section, compress_report, build_cio_reports)
+
+NOW = datetime(2026, 10, 16, 12, 0)
+
+REPORT = """### 📊 Technical & Fundamental Analysis: NVDA
+
+#### 1. Technical Diagnosis
+*   **Weekly (Macro)**: Uptrend above EMA 200, RSI 64.
+*   **Daily (Timing)**: Pullback to EMA 50 with MACD turning up.
+
+#### 2. News & Fundamental Analysis
+*   **Earnings Context (90d)**: """ + "Revenue beat with strong data center demand. " * 40 + """
+
+#### 3. Strategic Verdict
+*   **Action**: BUY
+*   **Timing Instruction**: Enter now, add on a dip to $120.
+*   **Rationale**: Trend intact and earnings momentum.
+"""
+
+
+def _news(title, days_ago, source="Reuters"):
+    published = NOW - timedelta(days=days_ago)
+    return {"title": title, "published": published.strftime("%Y-%m-%d %H:%M"),
+            "timestamp": published.timestamp(), "source": source}
+
+
+def test_count_and_truncate():
+    """Counts grow with the text; truncation fits the budget at a word boundary"""
+    text = "Nvidia supera las estimaciones de ingresos del tercer trimestre. " * 20
+    assert count_tokens("") == 0
+    assert count_tokens(text) > count_tokens(text[:100]) > 0
+
+    cut = truncate_to_tokens(text, 50)
+    assert count_tokens(cut) <= 50 and cut.endswith(" …")
+    assert text.startswith(cut[:-2])
+    assert truncate_to_tokens("short", 50) == "short"
+
+    kept, dropped = fit_lines(["a b c"] * 10, 20)
+    assert dropped == 10 - len(kept) and 0 < len(kept) < 10
+
+
+SAMPLE_PROMPTS = [
+    REPORT,
+    """
+    Eres un Analista Técnico y Fundamental Senior. Tu trabajo es analizar el activo BRK-B de forma INDIVIDUAL y OBJETIVA.
+
+    **MACRO (Semanal - 1W):**
+    - Precio: $412.37
+    - Tendencia Auto-Detectada: ALCISTA 📈
+    - EMA 200: 389.1245 (Posición: PRECIO ENCIMA)
+    - RSI (1W): 61.83
+    """,
+    "--- ⚡ CATALIZADORES (Últimos 5 días - ACCIÓN INMEDIATA) ---\n"
+    "- [2026-10-14 09:30] NVDA, AMD y TSM suben un 4,5% tras la guía de TSMC (Reuters)\n"
+    "- [2026-10-13 16:05] Apple's $3.1T market cap: iPhone 17 sales up 12% YoY (Bloomberg)\n",
+    "| Asset | Action | Amount ($) | Precise Instruction |\n| :--- | :--- | :--- | :--- |\n"
+    "| **GOOGL** | BUY | $1,250.00 | Enter market now. |\n| **CASH** | KEEP | $150 | Insufficient opportunities today. |",
+    "🏛️ Investment Strategy Report — SPY/QQQ ratio 0.8734, BTC-USD 67,412.5, EUR/USD 1.0842 ¿Qué pasó ESTA SEMANA?",
+]
+
+
+def test_estimate_never_undercounts():
+    """The offline fallback errs on the high side of o200k_base on real-looking prompts"""
+    encoding = prompt_budget._encoding()
+    if encoding is None:
+        pytest.skip("o200k_base vocabulary not available offline")
+    for text in SAMPLE_PROMPTS:
+        assert estimate_tokens(text) >= len(encoding.encode(text)), text[:60]
+
+
+def test_news_ranked_within_budget():
+    """Recent items that name the ticker come first; the rest is dropped to fit the budget"""
+    news = [_news("Markets drift ahead of Fed", 1), _news("NVDA unveils new GPU", 2),
+            _news("NVDA old earnings recap", 40), _news("Oil prices slip", 0)]
+    ranked = rank_news(news, "NVDA", now=NOW)
+    assert [n["title"] for n in ranked][:2] == ["NVDA unveils new GPU", "NVDA old earnings recap"]
+
+    many = [_news(f"NVDA headline number {i} about chips and guidance", i % 30) for i in range(200)]
+    section = build_news_section(many, "NVDA", "--- HEADER ---", "empty\n", budget=300)
+    assert section.startswith("--- HEADER ---\n")
+    assert count_tokens(section) <= 300
+    assert "noticias menos relevantes omitidas" in section
+    assert build_news_section([], "NVDA", "--- HEADER ---", "empty\n", budget=300) == "empty\n"
+
+
+def test_compress_report():
+    """Verdict fields are extracted; reports without the format fall back to truncated text"""
+    verdict = compress_report("NVDA", REPORT, {"price": 125.3, "trend": "ALCISTA", "rsi": 58})
+    assert verdict.startswith("**NVDA** → BUY | Precio $125.3")
+    assert "Enter now, add on a dip to $120." in verdict
+    assert "Trend intact" in verdict and "Pullback to EMA 50" in verdict
+    assert "data center" not in verdict
+    assert count_tokens(verdict) < count_tokens(REPORT) / 4
+
+    error = compress_report("TSLA", "❌ Error analizando TSLA: timeout " * 50, budget=40)
+    assert error.startswith("**TSLA**") and count_tokens(error) <= 40
+
+
+def test_cio_prompt_is_flat():
+    """Total size is bounded by the budget whatever the number of tickers"""
+    small = build_cio_reports([(f"T{i}", REPORT, {}) for i in range(3)], budget=2000)
+    large = build_cio_reports([(f"T{i}", REPORT, {}) for i in range(30)], budget=2000)
+    assert "**T0** → BUY" in small and "**T29** →" in large
+    assert count_tokens(large) <= 2000 + 30
+    assert build_cio_reports([]) == ""